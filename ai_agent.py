@@ -1,240 +1,462 @@
-import json
-import os
-import requests
-from typing import Dict, List, Optional
-import requests
-from config import HUGGINGFACE_API_KEY, CATEGORIES, DEMO_URL
+import asyncio
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from config import (HUGGINGFACE_API_KEY, CATEGORIES, DEMO_URL, LLM_API_URL, LLM_MAX_TOKENS, LLM_MODEL,
+                    PROMPT_CONTEXT_TOKENS, RESPONSE_DEADLINE)
+from intent_router import classify_intent
+from knowledge_base import KnowledgeBase, SharedKnowledgeBase, shared_knowledge_base
+from llm_client import AsyncLLMClient, CircuitOpenError, DeadlineExceeded, LLMClient, LLMError, shared_async_llm_client, shared_llm_client
+from metrics import CACHE_LOOKUPS, COALESCED, DEADLINE_MISSES, LATE_ANSWERS, LLM_ERRORS, RESPONSES, STAGE_SECONDS, configure_logging, timed
+from prompt_builder import PromptAssembler, estimate_tokens, truncate_to_tokens
+from response_cache import ResponseCache, make_key, shared_response_cache, shared_single_flight
+from warm_answers import WarmAnswers, shared_warm_answers
+from retrieval import pack_passages, reciprocal_rank_fusion
+
+logger = logging.getLogger(__name__)
+
+# Runs router calls raced against a response deadline; a call that misses it finishes here in the background
+DEADLINE_POOL = ThreadPoolExecutor(max_workers=16, thread_name_prefix="llm-deadline")
+
+class ConversationState:
+    """What one conversation remembers between messages"""
+
+    __slots__ = ("user_category", "conversation_history")
+
+    def __init__(self):
+        self.user_category: Optional[str] = None
+        self.conversation_history: List[Dict[str, str]] = []
 
 class ArymalabsAgent:
-    def __init__(self, scraped_data_path: str = "scraped_content.json"):
-        self.hf_api_key = HUGGINGFACE_API_KEY
-        # Use Hugging Face Router API directly with requests
+    def __init__(self, scraped_data_path: str = "scraped_content.json", knowledge_store_path: str = "knowledge.db",
+                 max_chunks: int = 5, context_tokens: int = PROMPT_CONTEXT_TOKENS, retrieval_mode: str = "bm25",
+                 vector_index_path: str = "knowledge_vectors", response_cache: Optional[ResponseCache] = None,
+                 llm_client: Optional[LLMClient] = None, async_llm_client: Optional[AsyncLLMClient] = None,
+                 deadline: float = RESPONSE_DEADLINE, knowledge: Optional[SharedKnowledgeBase] = None,
+                 warm_answers: Optional[WarmAnswers] = None):
         self.hf_api_key = HUGGINGFACE_API_KEY
-        self.api_url = "https://router.huggingface.co/v1/chat/completions"
-        self.scraped_data = self.load_scraped_data(scraped_data_path)
-        self.conversation_history = []
-        self.user_category = None
-        
-    def load_scraped_data(self, file_path: str) -> Dict:
-        """Load scraped data from JSON file"""
-        try:
-            with open(file_path, 'r') as f:
-                return json.load(f)
-        except FileNotFoundError:
-            print(f"Scraped data file {file_path} not found. Please run the scraper first.")
-            return {"main_content": "", "categorized_content": {}, "sections": {}}
+        self.api_url = LLM_API_URL
+        self.model = LLM_MODEL
+        # Pooled keep-alive client shared by all sessions, with retries and a circuit breaker
+        self.llm = llm_client if llm_client is not None else shared_llm_client()
+        # The async client is tied to an event loop, so the shared one is looked up per call
+        self.async_llm = async_llm_client
+        # Identical prompts in flight from concurrent async sessions share one upstream request
+        self.inflight = shared_single_flight()
+        # Seconds the router gets before the fallback answers instead (0 waits for the router)
+        self.deadline = deadline
+        self.max_chunks = max_chunks
+        self.max_tokens = LLM_MAX_TOKENS
+        # Templates are precompiled; retrieved content is packed to a token budget per message
+        self.prompts = PromptAssembler(max_context_tokens=context_tokens)
+        # Loaded once per process and shared by reference; reloaded in the background when the scraper rewrites it.
+        # Dense retrieval ("dense" or "hybrid") also needs the scraper-built vectors.
+        self.retrieval_mode = retrieval_mode
+        self.knowledge = knowledge if knowledge is not None else shared_knowledge_base(
+            scraped_data_path, knowledge_store_path, vector_index_path if retrieval_mode != "bm25" else None
+        )
+        # Shared across sessions by default; keys include kb_version so a re-scrape invalidates old answers
+        self.response_cache = response_cache if response_cache is not None else shared_response_cache()
+        # Answers prepared ahead of time for quick actions and frequent questions
+        self.warm = warm_answers if warm_answers is not None else shared_warm_answers()
+        self.last_response_source = None
+        self.state = ConversationState()
+
+    @property
+    def kb(self) -> KnowledgeBase:
+        """The knowledge base version loaded right now"""
+        return self.knowledge.current
+
+    @property
+    def kb_version(self) -> str:
+        return self.knowledge.current.version
+
+    @property
+    def scraped_data(self) -> Dict:
+        return self.knowledge.current.scraped_data
+
+    @property
+    def user_category(self) -> Optional[str]:
+        return self.state.user_category
+
+    @user_category.setter
+    def user_category(self, category: Optional[str]):
+        self.state.user_category = category
+
+    @property
+    def conversation_history(self) -> List[Dict[str, str]]:
+        return self.state.conversation_history
     
     def get_initial_question(self) -> str:
         """Return the initial question for new users"""
         return "Hello! I'm the Aryma Labs AI Agent. I can help you learn about our MMM Services, MMM Products, or Experimentation Products. What would you like to know?"
     
+    async def aprocess_user_response(self, user_input: str) -> str:
+        """Async process_user_response; the LLM call does not block a thread"""
+        return await self.acomplete(user_input, *self.user_response_context(user_input))
+    
+    async def ahandle_follow_up(self, user_input: str) -> str:
+        """Async handle_follow_up; the LLM call does not block a thread"""
+        return await self.acomplete(user_input, *self.follow_up_context(user_input))
+    
     def handle_general_query(self, user_input: str) -> str:
         """Handle general queries about Aryma Labs with dynamic content selection"""
-        print(f"🌐 [GENERAL] Handling general query: {user_input[:50]}...")
-        
-        # Get all available content for general queries
-        all_content = ""
-        
-        # Add main content first if available
-        if self.scraped_data.get("main_content"):
-            all_content = self.scraped_data["main_content"]
-        
-        # Add categorized content with some variation
-        categorized_content = self.scraped_data.get("categorized_content", {})
+        return self.complete(user_input, *self.general_query_context(user_input))
+    
+    def general_query_context(self, user_input: str) -> Tuple[str, str]:
+        """Select content for a general question, returning (relevant_content, "GENERAL")"""
+        logger.debug("general query input=%.50r", user_input)
         
-        # Vary the order and selection based on user input
-        user_input_lower = user_input.lower()
-        if "product" in user_input_lower:
-            # Prioritize product content
-            for category, content in categorized_content.items():
-                if "product" in category.lower():
-                    all_content += f"\n\n{category}:\n{content}"
-            for category, content in categorized_content.items():
-                if "product" not in category.lower():
-                    all_content += f"\n\n{category}:\n{content}"
-        elif "service" in user_input_lower:
-            # Prioritize service content
-            for category, content in categorized_content.items():
-                if "service" in category.lower():
-                    all_content += f"\n\n{category}:\n{content}"
-            for category, content in categorized_content.items():
-                if "service" not in category.lower():
-                    all_content += f"\n\n{category}:\n{content}"
-        else:
-            # Default order
-            for category, content in categorized_content.items():
-                all_content += f"\n\n{category}:\n{content}"
+        # Pick the passages that best match the question, packed into the context budget
+        with timed("retrieval"):
+            all_content = self.retrieve(user_input)
+            if not all_content:
+                all_content = truncate_to_tokens(self.scraped_data.get("main_content", ""),
+                                                 self.prompts.context_budget("GENERAL", user_input))
         
         if not all_content.strip():
             all_content = "Aryma Labs is a company specializing in Marketing Mix Modeling (MMM) solutions, products, and experimentation services."
         
-        # Generate response using all available content
-        response = self.generate_response(user_input, all_content, "GENERAL")
-        
-        # Add demo link
-        response += f"\n\n[Contact Us for Demo]({DEMO_URL})"
-        
-        return response
+        return all_content, "GENERAL"
     
     def process_user_response(self, user_input: str) -> str:
         """Process user response and determine their category"""
-        print(f"\n🎯 [PROCESS] Processing user response: {user_input[:50]}...")
-        user_input_lower = user_input.lower()
+        return self.complete(user_input, *self.user_response_context(user_input))
+    
+    def user_response_context(self, user_input: str) -> Tuple[str, str]:
+        """Determine the user's category from a first message and select its content"""
+        with timed("intent"):
+            intent = classify_intent(user_input)
         
         # Determine user's category based on their response
-        if any(keyword in user_input_lower for keyword in ['mmm service', 'service', 'services', 'mmm services']):
-            self.user_category = "MMM_SERVICES"
-            print(f"📂 [PROCESS] Category determined: MMM_SERVICES")
-        elif any(keyword in user_input_lower for keyword in ['mmm product', 'product', 'products', 'mmm products']):
-            self.user_category = "MMM_PRODUCTS"
-            print(f"📂 [PROCESS] Category determined: MMM_PRODUCTS")
-        elif any(keyword in user_input_lower for keyword in ['experimentation', 'experiment', 'testing', 'experimentation products']):
-            self.user_category = "EXPERIMENTATION_PRODUCTS"
-            print(f"📂 [PROCESS] Category determined: EXPERIMENTATION_PRODUCTS")
-        elif 'mmm' in user_input_lower and not any(keyword in user_input_lower for keyword in ['service', 'product', 'experiment']):
-            # If they just say "MMM" without specifying, default to services
-            self.user_category = "MMM_SERVICES"
-            print(f"📂 [PROCESS] Category determined: MMM_SERVICES (default for 'mmm')")
+        if intent.category:
+            self.user_category = intent.category
+            logger.debug("first message category=%s confidence=%s", intent.category, intent.confidence)
         else:
             # Handle general queries about Aryma Labs
-            print(f"❓ [PROCESS] No clear category, trying to answer generally")
-            return self.handle_general_query(user_input)
+            logger.debug("first message has no clear category, answering generally")
+            return self.general_query_context(user_input)
         
         # Get relevant content for the selected category
-        relevant_content = self.get_relevant_content(self.user_category)
-        print(f"📄 [PROCESS] Retrieved content: {len(relevant_content)} characters")
-        
-        # Generate response using LLM
-        response = self.generate_response(user_input, relevant_content, self.user_category)
-        
+        with timed("retrieval"):
+            relevant_content = self.get_relevant_content(self.user_category, user_input)
+        logger.debug("retrieved content chars=%d", len(relevant_content))
+        return relevant_content, self.user_category
+    
+    def complete(self, user_input: str, relevant_content: str, category: str) -> str:
+        """Generate the full response for the selected content and append the demo link"""
+        self.warm.record_query(user_input)
+        return self.finish_response(self.generate_response(user_input, relevant_content, category))
+    
+    async def acomplete(self, user_input: str, relevant_content: str, category: str) -> str:
+        self.warm.record_query(user_input)
+        return self.finish_response(await self.agenerate_response(user_input, relevant_content, category))
+    
+    def finish_response(self, response: str) -> str:
         # Add demo link
         response += f"\n\n[Contact Us for Demo]({DEMO_URL})"
-        print(f"✅ [PROCESS] Final response ready: {len(response)} characters")
-        # Determine response source based on length (AI responses are typically longer)
-        response_source = "HUGGING FACE AI" if len(response) > 320 else "FALLBACK SYSTEM"
-        print(f"🎯 [SUMMARY] Response source: {response_source}")
-        
+        self.record_response(len(response))
         return response
     
-    def get_relevant_content(self, category: str) -> str:
+    def record_response(self, chars: int):
+        """Count the answer under the source that actually produced it"""
+        RESPONSES.inc(source=self.last_response_source or "unknown")
+        logger.info("response ready source=%s chars=%d", self.last_response_source, chars)
+    
+    def stream_reply(self, user_input: str, first_message: bool = False) -> Iterator[str]:
+        """Route a message like process_user_response/handle_follow_up, yielding the answer as it streams"""
+        context = self.user_response_context if first_message else self.follow_up_context
+        relevant_content, category = context(user_input)
+        self.warm.record_query(user_input)
+        length = 0
+        for token in self.generate_response_stream(user_input, relevant_content, category):
+            length += len(token)
+            yield token
+        demo_link = f"\n\n[Contact Us for Demo]({DEMO_URL})"
+        yield demo_link
+        self.record_response(length + len(demo_link))
+    
+    def retrieve(self, user_input: str, category: Optional[str] = None) -> str:
+        """Return the top BM25 passages for the input that fit within the context budget"""
+        if not user_input:
+            return ""
+        kb = self.kb
+        passages = kb.retriever.search(user_input, self.max_chunks, category)
+        if kb.vectors:
+            dense = self.dense_search(user_input, category, kb)
+            if self.retrieval_mode == "hybrid":
+                passages = reciprocal_rank_fusion([passages, dense], self.max_chunks)
+            elif dense:
+                passages = dense
+        return self.pack(passages, category or "GENERAL", user_input)
+    
+    def pack(self, passages: List[Dict], category: str, user_input: str) -> str:
+        """Join the best passages that fit in the prompt's token budget for this message"""
+        budget = self.prompts.context_budget(category, user_input)
+        return pack_passages(passages, budget, cost=estimate_tokens, truncate=truncate_to_tokens)
+    
+    def dense_search(self, user_input: str, category: Optional[str] = None,
+                     kb: Optional[KnowledgeBase] = None) -> List[Dict]:
+        """Rank passages by embedding similarity, optionally within one category"""
+        kb = kb or self.kb
+        # Over-fetch when filtering by category so enough candidates survive the filter
+        hits = kb.vectors.search(user_input, self.max_chunks * 4 if category else self.max_chunks)
+        chunks = kb.store.get_chunks([chunk_id for chunk_id, _ in hits])
+        passages = []
+        for chunk_id, score in hits:
+            passage = chunks.get(chunk_id)
+            if passage and (not category or category in passage.get("categories", ())):
+                passages.append(dict(passage, score=score))
+        return passages[:self.max_chunks]
+    
+    def get_relevant_content(self, category: str, user_input: str = "") -> str:
         """Get content relevant to the user's selected category"""
-        if category not in self.scraped_data.get("categorized_content", {}):
-            return self.scraped_data.get("main_content", "")
-        
-        category_content = self.scraped_data["categorized_content"][category]
-        if isinstance(category_content, list):
-            return " ".join(category_content)
-        return str(category_content)
+        content = self.retrieve(user_input, category)
+        if not content:
+            # Nothing in the category matches the wording; use the category's leading passages
+            content = self.pack(self.kb.retriever.category_passages(category, self.max_chunks), category, user_input)
+        if not content:
+            content = truncate_to_tokens(self.scraped_data.get("main_content", ""),
+                                         self.prompts.context_budget(category, user_input))
+        return content
+    
+    def build_system_prompt(self, user_input: str, relevant_content: str, category: str) -> str:
+        """Render the system prompt for a category and the retrieved content"""
+        return self.prompts.build(category, user_input, relevant_content)
     
     def generate_response(self, user_input: str, relevant_content: str, category: str) -> str:
         """Generate AI response using Hugging Face InferenceClient with fallback"""
-        print(f"\n🤖 [AI AGENT] Generating response for category: {category}")
-        print(f"📝 [AI AGENT] User input: {user_input[:100]}...")
+        return "".join(self.generate_response_stream(user_input, relevant_content, category, stream=False))
+    
+    def generate_response_stream(self, user_input: str, relevant_content: str, category: str,
+                                 stream: bool = True) -> Iterator[str]:
+        """Yield the response as it is generated: router tokens when streaming, otherwise one whole piece"""
+        logger.debug("generating category=%s input=%.100r", category, user_input)
+        deadline_at = time.monotonic() + self.deadline if self.deadline else None
         
         # Try Hugging Face Router API first
         if self.hf_api_key:
-            print("🔑 [AI AGENT] Hugging Face Router API available, attempting AI generation...")
+            streamed = []
             try:
-                # Create a conversational prompt
-                if category == "GENERAL":
-                    if "about" in user_input.lower() or "what is" in user_input.lower():
-                        system_prompt = f"""You are a helpful AI assistant for Aryma Labs, a Marketing Mix Modeling company. 
-
-Based on this information about Aryma Labs: {relevant_content[:1000]}
-
-Please provide natural, conversational responses about Aryma Labs. Be helpful and informative."""
-                    elif "contact" in user_input.lower() or "demo" in user_input.lower():
-                        system_prompt = f"""You are a helpful AI assistant for Aryma Labs. 
-
-Based on this information: {relevant_content[:1000]}
-
-Please provide information about contacting Aryma Labs and requesting demos. Be helpful and conversational."""
-                    elif "founder" in user_input.lower() or "ceo" in user_input.lower() or "leadership" in user_input.lower():
-                        system_prompt = f"""You are a helpful AI assistant for Aryma Labs. 
-
-Based on this information: {relevant_content[:1000]}
-
-IMPORTANT: Only provide information that is explicitly mentioned in the provided content. If founder/leadership information is not available in the content, politely state that this information is not available in the current data and suggest checking the company website or LinkedIn for the most up-to-date information.
-
-Please be helpful and conversational."""
-                    elif "product" in user_input.lower():
-                        system_prompt = f"""You are a helpful AI assistant for Aryma Labs. 
-
-Based on this product information: {relevant_content[:1000]}
-
-Please provide information about Aryma Labs' products. Be helpful and conversational."""
+                cache_key, messages = self.prepare(user_input, relevant_content, category)
+                cached_response = self.cached(cache_key, user_input, messages)
+                if cached_response:
+                    yield cached_response
+                    return
+                
+                started = time.perf_counter()
+                if stream:
+                    if deadline_at:
+                        tokens = self.deadline_stream(messages, cache_key, deadline_at)
                     else:
-                        system_prompt = f"""You are a helpful AI assistant for Aryma Labs, a Marketing Mix Modeling company. 
-
-Based on this information: {relevant_content[:1000]}
-
-Please provide helpful, conversational responses about Aryma Labs."""
+                        tokens = self.llm.chat_stream(messages, self.model, max_tokens=self.max_tokens, temperature=0.7,
+                                                      api_key=self.hf_api_key)
+                    for token in tokens:
+                        if not streamed:
+                            STAGE_SECONDS.observe(time.perf_counter() - started, stage="first_token")
+                        streamed.append(token)
+                        yield token
+                    ai_response = "".join(streamed)
+                elif deadline_at:
+                    ai_response = self.deadline_chat(messages, cache_key, deadline_at)
                 else:
-                    system_prompt = f"""You are a helpful AI assistant for Aryma Labs. 
-
-Based on this information about {CATEGORIES.get(category, category)}: {relevant_content[:1000]}
-
-Please provide helpful, conversational responses about {CATEGORIES.get(category, category)} from Aryma Labs."""
-                
-                # Use Hugging Face Router API with requests
-                headers = {
-                    "Authorization": f"Bearer {self.hf_api_key}",
-                    "Content-Type": "application/json"
-                }
-                
-                data = {
-                    "model": "openai/gpt-oss-120b:cerebras",
-                    "messages": [
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": user_input}
-                    ],
-                    "max_tokens": 800,
-                    "temperature": 0.7
-                }
+                    ai_response = self.ask_router(messages)
+                STAGE_SECONDS.observe(time.perf_counter() - started, stage="upstream")
                 
-                response = requests.post(self.api_url, headers=headers, json=data, timeout=30)
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    ai_response = result["choices"][0]["message"]["content"]
-                    
-                    if ai_response and len(ai_response) > 20:
-                        print(f"✅ [HUGGING FACE] SUCCESS! Generated conversational response")
-                        print(f"📏 [HUGGING FACE] Response length: {len(ai_response)} characters")
-                        print(f"🔗 [HUGGING FACE] Adding demo link...")
-                        return ai_response
-                    else:
-                        print(f"⚠️ [HUGGING FACE] Response too short: {len(ai_response) if ai_response else 0} chars")
+                if ai_response and len(ai_response) > 20:
+                    self.response_cache.put(cache_key, ai_response)
+                    self.last_response_source = "llm"
+                    if not stream:
+                        yield ai_response
+                    return
                 else:
-                    print(f"❌ [HUGGING FACE] API error: {response.status_code} - {response.text[:100]}")
+                    LLM_ERRORS.inc(kind="short_response")
+                    logger.warning("router response too short chars=%d", len(ai_response) if ai_response else 0)
                     
-            except Exception as e:
-                print(f"❌ [HUGGING FACE] Router API error: {str(e)[:100]}...")
-                print("🔄 [AI AGENT] Falling back to keyword-based response...")
+            except CircuitOpenError:
+                LLM_ERRORS.inc(kind="circuit_open")
+                logger.debug("router marked unhealthy, skipping API call")
+            except DeadlineExceeded:
+                DEADLINE_MISSES.inc()
+                logger.info("router missed the %.2fs deadline, answering from the fallback", self.deadline)
+            except LLMError as e:
+                LLM_ERRORS.inc(kind="api")
+                logger.warning("router API error, falling back: %.100s", e)
+            except Exception:
+                LLM_ERRORS.inc(kind="unexpected")
+                logger.exception("unexpected error calling the router, falling back")
+            if streamed:
+                # Tokens already reached the user; a partial answer beats a second, different one
+                logger.warning("stream ended early chars=%d", len("".join(streamed)))
+                self.last_response_source = "llm"
+                return
         else:
-            print("❌ [AI AGENT] No Hugging Face client available")
-            print("🔄 [AI AGENT] Using fallback response...")
+            logger.debug("no Hugging Face API key, using fallback response")
+        
+        yield self.fallback(user_input, relevant_content, category)
+    
+    def deadline_chat(self, messages: List[Dict[str, str]], cache_key: str, deadline_at: float) -> str:
+        """Run the router call on the deadline pool, raising DeadlineExceeded if it is not done in time"""
+        future = DEADLINE_POOL.submit(self.ask_router, messages)
+        try:
+            return future.result(timeout=max(0.0, deadline_at - time.monotonic()))
+        except TimeoutError:
+            future.add_done_callback(lambda done: self.cache_late_answer(cache_key, done))
+            raise DeadlineExceeded(f"no answer within {self.deadline}s")
+    
+    def deadline_stream(self, messages: List[Dict[str, str]], cache_key: str, deadline_at: float) -> Iterator[str]:
+        """Stream router tokens, raising DeadlineExceeded if the first token has not arrived by deadline_at
+        
+        The stream is read on the deadline pool; once the first token is in, the rest follows without a deadline.
+        """
+        tokens: queue.Queue = queue.Queue()
+        lock = threading.Lock()
+        state = {"abandoned": False}
         
-        # Fallback to keyword-based response
-        print("🔧 [FALLBACK] Generating keyword-based response...")
-        fallback_response = self.generate_fallback_response(user_input, relevant_content, category)
-        print(f"✅ [FALLBACK] Generated fallback response: {len(fallback_response)} characters")
-        print(f"🔗 [FALLBACK] Adding demo link...")
+        def pump():
+            parts = []
+            try:
+                for token in self.llm.chat_stream(messages, self.model, max_tokens=self.max_tokens, temperature=0.7,
+                                                  api_key=self.hf_api_key):
+                    parts.append(token)
+                    tokens.put(token)
+            except Exception as e:
+                tokens.put(e)
+                return
+            tokens.put(None)
+            with lock:
+                abandoned = state["abandoned"]
+            if abandoned:
+                late = Future()
+                late.set_result("".join(parts))
+                self.cache_late_answer(cache_key, late)
+        
+        DEADLINE_POOL.submit(pump)
+        try:
+            item = tokens.get(timeout=max(0.0, deadline_at - time.monotonic()))
+        except queue.Empty:
+            with lock:
+                state["abandoned"] = True
+            raise DeadlineExceeded(f"no token within {self.deadline}s")
+        while item is not None:
+            if isinstance(item, Exception):
+                raise item
+            yield item
+            item = tokens.get()
+    
+    def cache_late_answer(self, cache_key: str, future, unpack: Callable = lambda result: result):
+        """Store an answer that missed the deadline so the next identical question gets it"""
+        if future.cancelled() or future.exception() is not None:
+            return
+        ai_response = unpack(future.result())
+        if ai_response and len(ai_response) > 20:
+            self.response_cache.put(cache_key, ai_response)
+            LATE_ANSWERS.inc()
+            logger.info("cached late router answer chars=%d", len(ai_response))
+    
+    def prepare(self, user_input: str, relevant_content: str, category: str) -> Tuple[str, List[Dict[str, str]]]:
+        """Render the prompt for a message, returning (cache_key, chat messages)"""
+        with timed("prompt"):
+            system_prompt = self.build_system_prompt(user_input, relevant_content, category)
+        cache_key = make_key(user_input, category, system_prompt, self.kb_version, self.model)
+        return cache_key, [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_input}
+        ]
+    
+    def ask_router(self, messages: List[Dict[str, str]]) -> str:
+        """One blocking chat completion with the agent's model settings"""
+        return self.llm.chat(messages, self.model, max_tokens=self.max_tokens, temperature=0.7, api_key=self.hf_api_key)
+    
+    def cached(self, cache_key: str, user_input: str, messages: List[Dict[str, str]]) -> Optional[str]:
+        """Look up a warm or cached answer, counting hits and misses"""
+        warm = self.warm.get(cache_key)
+        if warm:
+            warm_response, stale = warm
+            if stale:
+                # Serve the stale answer now and regenerate it for the next click
+                self.warm.revalidate(cache_key, user_input, self.kb_version, lambda: self.ask_router(messages))
+            CACHE_LOOKUPS.inc(result="warm")
+            self.last_response_source = "warm"
+            return warm_response
+        cached_response = self.response_cache.get(cache_key)
+        CACHE_LOOKUPS.inc(result="hit" if cached_response else "miss")
+        if cached_response:
+            self.last_response_source = "cache"
+        return cached_response
+    
+    async def agenerate_response(self, user_input: str, relevant_content: str, category: str) -> str:
+        """Async generate_response; concurrent identical prompts share one router request"""
+        logger.debug("generating category=%s input=%.100r", category, user_input)
+        started = time.monotonic()
+        if self.hf_api_key:
+            try:
+                cache_key, messages = self.prepare(user_input, relevant_content, category)
+                cached_response = self.cached(cache_key, user_input, messages)
+                if cached_response:
+                    return cached_response
+                
+                client = self.async_llm or shared_async_llm_client()
+                with timed("upstream"):
+                    call = asyncio.ensure_future(self.inflight.run(
+                        cache_key,
+                        lambda: client.chat(messages, self.model, max_tokens=self.max_tokens, temperature=0.7, api_key=self.hf_api_key)
+                    ))
+                    if self.deadline:
+                        done, _ = await asyncio.wait({call}, timeout=max(0.0, started + self.deadline - time.monotonic()))
+                        if not done:
+                            # Keep the call running so its answer still lands in the cache (while this loop lives)
+                            call.add_done_callback(lambda late: self.cache_late_answer(cache_key, late, lambda result: result[0]))
+                            raise DeadlineExceeded(f"no answer within {self.deadline}s")
+                    ai_response, shared = await call
+                if shared:
+                    COALESCED.inc()
+                if ai_response and len(ai_response) > 20:
+                    if not shared:
+                        self.response_cache.put(cache_key, ai_response)
+                    self.last_response_source = "llm"
+                    return ai_response
+                LLM_ERRORS.inc(kind="short_response")
+                logger.warning("router response too short chars=%d", len(ai_response) if ai_response else 0)
+            except CircuitOpenError:
+                LLM_ERRORS.inc(kind="circuit_open")
+                logger.debug("router marked unhealthy, skipping API call")
+            except DeadlineExceeded:
+                DEADLINE_MISSES.inc()
+                logger.info("router missed the %.2fs deadline, answering from the fallback", self.deadline)
+            except LLMError as e:
+                LLM_ERRORS.inc(kind="api")
+                logger.warning("router API error, falling back: %.100s", e)
+            except Exception:
+                LLM_ERRORS.inc(kind="unexpected")
+                logger.exception("unexpected error calling the router, falling back")
+        else:
+            logger.debug("no Hugging Face API key, using fallback response")
+        return self.fallback(user_input, relevant_content, category)
+    
+    def fallback(self, user_input: str, relevant_content: str, category: str) -> str:
+        """Keyword-based response used whenever the router cannot answer"""
+        with timed("fallback"):
+            fallback_response = self.generate_fallback_response(user_input, relevant_content, category)
+        self.last_response_source = "fallback"
         return fallback_response
     
     def generate_fallback_response(self, user_input: str, relevant_content: str, category: str) -> str:
         """Generate a dynamic fallback response when AI API is not available"""
-        user_input_lower = user_input.lower()
+        intent = classify_intent(user_input)
         
         if category == "GENERAL":
             # For general queries, provide comprehensive information
-            if "about" in user_input_lower or "what is" in user_input_lower or "tell me" in user_input_lower:
+            if intent.sub_intent == "about":
                 return f"Aryma Labs is a company specializing in Marketing Mix Modeling (MMM) solutions. {relevant_content[:800]}..."
-            elif "contact" in user_input_lower or "how to contact" in user_input_lower:
+            elif intent.sub_intent == "contact":
                 return f"To contact Aryma Labs, you can reach out through our website or request a demo. {relevant_content[:400]}..."
-            elif "services" in user_input_lower:
+            elif intent.category == "MMM_SERVICES":
                 return f"Aryma Labs offers comprehensive MMM services including analysis, consulting, and implementation. {relevant_content[:600]}..."
-            elif "products" in user_input_lower:
+            elif intent.category == "MMM_PRODUCTS":
                 return f"Our MMM products include advanced analytics tools and platforms. {relevant_content[:600]}..."
             else:
                 return f"Aryma Labs provides Marketing Mix Modeling solutions and services. {relevant_content[:600]}..."
@@ -242,81 +464,58 @@ Please provide helpful, conversational responses about {CATEGORIES.get(category,
             category_name = CATEGORIES.get(category, category)
             
             # Dynamic responses based on user intent
-            if "what" in user_input_lower or "tell me" in user_input_lower:
+            if intent.sub_intent == "about":
                 return f"Based on our {category_name.lower()}, here's what we offer: {relevant_content[:600]}..."
-            elif "how" in user_input_lower:
+            elif intent.sub_intent == "how":
                 return f"For {category_name.lower()}, here's how we can help: {relevant_content[:600]}..."
-            elif "contact" in user_input_lower or "demo" in user_input_lower:
+            elif intent.sub_intent == "contact":
                 return f"To learn more about our {category_name.lower()}, please contact us for a demo. {relevant_content[:400]}..."
-            elif "price" in user_input_lower or "cost" in user_input_lower:
+            elif intent.sub_intent == "pricing":
                 return f"For pricing information about our {category_name.lower()}, please contact us for a personalized quote. {relevant_content[:400]}..."
             else:
                 return f"Here's detailed information about our {category_name.lower()}: {relevant_content[:600]}..."
     
     def handle_follow_up(self, user_input: str) -> str:
         """Handle follow-up questions"""
-        print(f"\n🔄 [FOLLOW-UP] Handling follow-up: {user_input[:50]}...")
-        
-        user_input_lower = user_input.lower()
+        return self.complete(user_input, *self.follow_up_context(user_input))
+    
+    def follow_up_context(self, user_input: str) -> Tuple[str, str]:
+        """Update the category from a follow-up message and select its content"""
+        with timed("intent"):
+            intent = classify_intent(user_input)
         
         # Check for general queries that should use all content
-        general_queries = [
-            'about aryma', 'what is aryma', 'tell me about aryma', 'who is aryma',
-            'company', 'company info', 'about the company', 'what does aryma do',
-            'overview', 'introduction', 'background', 'history', 'contact',
-            'how to contact', 'where is aryma', 'aryma labs', 'more information'
-        ]
-        
-        if any(query in user_input_lower for query in general_queries):
-            print(f"🌐 [FOLLOW-UP] General query detected, using all content")
-            return self.handle_general_query(user_input)
+        if intent.general:
+            logger.debug("follow-up is a general query")
+            return self.general_query_context(user_input)
         
         if not self.user_category:
             # Try to determine category from user input
-            print(f"❓ [FOLLOW-UP] No category set, processing as new response")
-            return self.process_user_response(user_input)
-        
-        print(f"📂 [FOLLOW-UP] Current category: {self.user_category}")
+            logger.debug("no category set, treating follow-up as a first message")
+            return self.user_response_context(user_input)
         
         # Check for category change requests
         old_category = self.user_category
-        
-        # Check for category change requests
-        if any(keyword in user_input_lower for keyword in ['product', 'products', 'tool', 'tools', 'platform']):
-            if 'mmm' in user_input_lower or self.user_category == "MMM_SERVICES":
-                self.user_category = "MMM_PRODUCTS"
-                print(f"🔄 [FOLLOW-UP] Category switched: {old_category} → MMM_PRODUCTS")
-        elif any(keyword in user_input_lower for keyword in ['experiment', 'testing', 'a/b test']):
-            self.user_category = "EXPERIMENTATION_PRODUCTS"
-            print(f"🔄 [FOLLOW-UP] Category switched: {old_category} → EXPERIMENTATION_PRODUCTS")
-        elif any(keyword in user_input_lower for keyword in ['service', 'services', 'consulting']):
-            self.user_category = "MMM_SERVICES"
-            print(f"🔄 [FOLLOW-UP] Category switched: {old_category} → MMM_SERVICES")
-        else:
-            print(f"📂 [FOLLOW-UP] Category unchanged: {self.user_category}")
+        # A bare "products" while discussing experimentation means the experimentation products
+        keeps_experimentation = (intent.category == "MMM_PRODUCTS" and "mmm" not in intent.labels
+                                 and old_category == "EXPERIMENTATION_PRODUCTS")
+        if intent.category and intent.category != old_category and not keeps_experimentation:
+            self.user_category = intent.category
+            logger.debug("category switched %s -> %s", old_category, intent.category)
         
         # Get relevant content for the user's category
-        relevant_content = self.get_relevant_content(self.user_category)
-        print(f"📄 [FOLLOW-UP] Retrieved content: {len(relevant_content)} characters")
-        
-        # Generate response
-        response = self.generate_response(user_input, relevant_content, self.user_category)
-        
-        # Add demo link
-        response += f"\n\n[Contact Us for Demo]({DEMO_URL})"
-        print(f"✅ [FOLLOW-UP] Final response ready: {len(response)} characters")
-        # Determine response source based on length (AI responses are typically longer)
-        response_source = "HUGGING FACE AI" if len(response) > 320 else "FALLBACK SYSTEM"
-        print(f"🎯 [SUMMARY] Response source: {response_source}")
-        
-        return response
+        with timed("retrieval"):
+            relevant_content = self.get_relevant_content(self.user_category, user_input)
+        logger.debug("retrieved content chars=%d category=%s", len(relevant_content), self.user_category)
+        return relevant_content, self.user_category
     
     def reset_conversation(self):
         """Reset the conversation state"""
-        self.conversation_history = []
-        self.user_category = None
+        # A new object rather than clearing the old one, so shallow copies of an agent never share a conversation
+        self.state = ConversationState()
 
 def main():
+    configure_logging()
     # Test the agent
     agent = ArymalabsAgent()
     
@@ -1,8 +1,18 @@
 import streamlit as st
-import json
+import streamlit.components.v1 as components
 from ai_agent import ArymalabsAgent
-from web_scraper import ArymalabsScraper
+from config import CHAT_HISTORY_WINDOW, METRICS_PORT, QUICK_ACTIONS
+from metrics import configure_logging, start_metrics_server
+from refresh_scheduler import RefreshScheduler, start_refresh_scheduler
+from warm_answers import start_warm_answers
+import json
 import time
+from typing import Optional
+
+configure_logging()
+if METRICS_PORT:
+    # Idempotent, so Streamlit's script reruns keep the one server
+    start_metrics_server(METRICS_PORT)
 
 # Page configuration
 st.set_page_config(
@@ -13,8 +23,7 @@ st.set_page_config(
 )
 
 # Custom CSS for modern styling
-st.markdown("""
-<style>
+APP_CSS = """
     .main-header {
         font-size: 3rem;
         font-weight: 700;
@@ -154,8 +163,118 @@ st.markdown("""
         transform: translateY(-2px);
         box-shadow: 0 6px 20px rgba(102, 126, 234, 0.4);
     }
-</style>
-""", unsafe_allow_html=True)
+"""
+
+def inject_css_once():
+    """Add the stylesheet to the page once per session rather than resending it on every rerun
+
+    A <style> drawn with st.markdown disappears as soon as a rerun stops drawing it, so a
+    zero-height component copies it into the page's <head>, which reruns never touch.
+    """
+    if st.session_state.get("css_injected"):
+        return
+    components.html(f"""<script>
+const page = window.parent.document;
+if (!page.getElementById("aryma-styles")) {{
+    const style = page.createElement("style");
+    style.id = "aryma-styles";
+    style.textContent = {json.dumps(APP_CSS)};
+    page.head.appendChild(style);
+}}
+</script>""", height=0)
+    st.session_state.css_injected = True
+
+inject_css_once()
+
+# Messages rendered together as one element; a full block never changes, so Streamlit sends it to the
+# browser once per session and afterwards only its hash (see global.minCachedMessageSize in .streamlit/config.toml)
+CHAT_BLOCK_SIZE = 10
+
+# Fragment reruns (Streamlit >= 1.33) redraw only the transcript; older versions rerun the whole script
+fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None) or (lambda func: func)
+
+def message_html(role: str, content: str) -> str:
+    css_class = "user-message" if role == "user" else "agent-message"
+    return f'<div class="{css_class}">{content}</div>'
+
+def render_message(role: str, content: str, container=st):
+    container.markdown(message_html(role, content), unsafe_allow_html=True)
+
+@fragment
+def render_history():
+    """Show the latest messages in fixed blocks, with older ones behind a "show earlier" button"""
+    messages = st.session_state.messages
+    
+    def first_shown() -> int:
+        # A block boundary, so each block keeps the same messages from one run to the next
+        return max(0, len(messages) - st.session_state.history_window) // CHAT_BLOCK_SIZE * CHAT_BLOCK_SIZE
+    
+    start = first_shown()
+    if start and st.button(f"Show earlier messages ({start} hidden)", key="show_earlier"):
+        st.session_state.history_window += CHAT_HISTORY_WINDOW
+        start = first_shown()
+    for block_start in range(start, len(messages), CHAT_BLOCK_SIZE):
+        block = messages[block_start:block_start + CHAT_BLOCK_SIZE]
+        st.markdown("\n\n".join(message_html(message["role"], message["content"]) for message in block),
+                    unsafe_allow_html=True)
+
+def stream_agent_response(agent: ArymalabsAgent, user_input: str, first_message: bool) -> str:
+    """Render the agent's reply token by token and return the complete text"""
+    placeholder = st.empty()
+    render_message("assistant", "🤖 AI Agent is thinking...", placeholder)
+    response = ""
+    last_render = 0.0
+    try:
+        for token in agent.stream_reply(user_input, first_message):
+            response += token
+            # Redraw at most ~20 times a second; each redraw resends the whole message
+            if time.monotonic() - last_render > 0.05:
+                render_message("assistant", response + "▌", placeholder)
+                last_render = time.monotonic()
+    except Exception as e:
+        response = f"I apologize, but I'm having trouble processing your request. Please try again. Error: {str(e)}"
+    render_message("assistant", response, placeholder)
+    return response
+
+def format_age(timestamp: float) -> str:
+    seconds = max(0, time.time() - timestamp)
+    if seconds < 60:
+        return "just now"
+    if seconds < 3600:
+        return f"{int(seconds // 60)} min ago"
+    if seconds < 86400:
+        return f"{seconds / 3600:.1f} h ago"
+    return f"{seconds / 86400:.1f} days ago"
+
+def status_line(online: bool, text: str, container=st):
+    indicator = "status-online" if online else "status-offline"
+    container.markdown(f'<span class="status-indicator {indicator}"></span>{text}', unsafe_allow_html=True)
+
+def render_status(container, agent: ArymalabsAgent, scheduler: Optional[RefreshScheduler]):
+    """Agent and content freshness as of this rerun"""
+    status_line(True, "AI Agent Online", container)
+    if scheduler is None:
+        status_line(False, "Scheduled refresh off", container)
+        container.caption(f"Content loaded {format_age(agent.kb.loaded_at)}")
+        return
+    status = scheduler.status()
+    if status["running"]:
+        status_line(True, "Refreshing content...", container)
+    elif status["consecutive_failures"]:
+        status_line(False, f"Last refresh failed ({status['consecutive_failures']} in a row)", container)
+        container.caption(status["last_error"])
+    elif status["last_success"]:
+        status_line(True, f"Content refreshed {format_age(status['last_success'])}", container)
+    else:
+        status_line(True, f"Content loaded {format_age(agent.kb.loaded_at)}", container)
+    details = []
+    if status["last_success"]:
+        details.append(f"{status['pages']} pages, {status['pages_changed']} changed in {status['duration']:.0f}s")
+    details.append(f"{status['failures']} failed runs")
+    if status["next_run"]:
+        wait = max(0, status["next_run"] - time.time())
+        details.append(f"next in {wait / 60:.0f} min" if wait < 7200 else f"next in {wait / 3600:.0f} h")
+    container.caption(" · ".join(details))
 
 def main():
     # Header
@@ -189,8 +308,8 @@ def main():
             st.session_state.quick_action = "demo"
         
         st.markdown("### 📊 Status")
-        st.markdown('<span class="status-indicator status-online"></span>AI Agent Online', unsafe_allow_html=True)
-        st.markdown('<span class="status-indicator status-online"></span>Web Scraper Active', unsafe_allow_html=True)
+        # Filled in once the agent is loaded
+        status_box = st.container()
         
         st.markdown("### 💡 Tips")
         st.markdown("""
@@ -207,6 +326,7 @@ def main():
         st.session_state.messages = []
         st.session_state.agent = None
         st.session_state.quick_action = None
+        st.session_state.history_window = CHAT_HISTORY_WINDOW
     
     # Initialize agent
     if st.session_state.agent is None:
@@ -218,79 +338,45 @@ def main():
                 st.error(f"❌ Error initializing agent: {e}")
                 return
     
+    # Started once per process; re-crawls in the background and hot-swaps the shared knowledge base
+    scheduler = start_refresh_scheduler(st.session_state.agent.knowledge)
+    # Quick actions and frequent questions are answered ahead of time, again after every refresh
+    start_warm_answers(st.session_state.agent)
+    render_status(status_box, st.session_state.agent, scheduler)
+    
     # Handle quick actions
+    pending_input = None
     if st.session_state.quick_action:
-        quick_actions = {
-            "about": "Tell me about Aryma Labs",
-            "services": "I'm interested in MMM Services",
-            "products": "I'm interested in MMM Products", 
-            "experimentation": "I'm interested in Experimentation Products",
-            "demo": "I want to request a demo"
-        }
-        
-        if st.session_state.quick_action in quick_actions:
-            user_input = quick_actions[st.session_state.quick_action]
-            st.session_state.quick_action = None
-            
-            # Add user message
-            st.session_state.messages.append({
-                "role": "user",
-                "content": user_input
-            })
-            
-            # Get agent response
-            with st.spinner("🤖 AI Agent is thinking..."):
-                try:
-                    if len(st.session_state.messages) == 1:
-                        response = st.session_state.agent.process_user_response(user_input)
-                    else:
-                        response = st.session_state.agent.handle_follow_up(user_input)
-                except Exception as e:
-                    response = f"I apologize, but I'm having trouble processing your request. Please try again. Error: {str(e)}"
-            
-            # Add agent response
-            st.session_state.messages.append({
-                "role": "assistant",
-                "content": response
-            })
-            st.rerun()
+        pending_input = QUICK_ACTIONS.get(st.session_state.quick_action)
+        st.session_state.quick_action = None
     
     # Chat interface
     st.markdown('<div class="chat-container">', unsafe_allow_html=True)
     
     # Display messages
-    for message in st.session_state.messages:
-        if message["role"] == "user":
-            st.markdown(f'<div class="user-message">{message["content"]}</div>', unsafe_allow_html=True)
-        else:
-            st.markdown(f'<div class="agent-message">{message["content"]}</div>', unsafe_allow_html=True)
+    render_history()
     
     # Chat input
     user_input = st.chat_input("💬 Ask me anything about Aryma Labs...")
-    
     if user_input:
+        pending_input = user_input
+    
+    if pending_input:
         # Add user message
         st.session_state.messages.append({
             "role": "user",
-            "content": user_input
+            "content": pending_input
         })
+        render_message("user", pending_input)
         
-        # Get agent response
-        with st.spinner("🤖 AI Agent is thinking..."):
-            try:
-                if len(st.session_state.messages) == 1:
-                    response = st.session_state.agent.process_user_response(user_input)
-                else:
-                    response = st.session_state.agent.handle_follow_up(user_input)
-            except Exception as e:
-                response = f"I apologize, but I'm having trouble processing your request. Please try again. Error: {str(e)}"
+        # Stream the agent response below the conversation as it is generated
+        response = stream_agent_response(st.session_state.agent, pending_input, len(st.session_state.messages) == 1)
         
-        # Add agent response
+        # Add agent response; it is already on screen, so no rerun is needed to show it
         st.session_state.messages.append({
             "role": "assistant",
             "content": response
         })
-        st.rerun()
     
     st.markdown('</div>', unsafe_allow_html=True)
     
@@ -0,0 +1,170 @@
+"""Batch answers: run every question of a JSONL file through the agent.
+
+    python batch_runner.py questions.jsonl --output answers.jsonl --concurrency 8 --rps 2
+
+Each input line is a JSON object holding a question (the first of "question",
+"query", "prompt" or "body", or --question-field) and optionally an id ("id" or
+"request_id", or --id-field; the line number otherwise). Answers are appended to
+the output as they complete, one JSON line per question, so an interrupted run
+resumes where it stopped when started again with the same output file.
+"""
+import argparse
+import asyncio
+import copy
+import json
+import os
+import sys
+import time
+from typing import Dict, Iterator, Optional, Set, Tuple
+
+from ai_agent import ArymalabsAgent
+from config import METRICS_PATH
+from metrics import METRICS, configure_logging
+from rate_limit import TokenBucket
+
+QUESTION_FIELDS = ("question", "query", "prompt", "body")
+ID_FIELDS = ("id", "request_id")
+
+def first_field(item: Dict, fields: Tuple[str, ...]) -> Optional[str]:
+    for field in fields:
+        if item.get(field):
+            return str(item[field])
+    return None
+
+def read_questions(path: str, question_field: Optional[str] = None,
+                   id_field: Optional[str] = None) -> Iterator[Tuple[str, str]]:
+    """Yield (id, question) pairs from a JSONL file one line at a time, skipping lines without a question"""
+    question_fields = (question_field,) if question_field else QUESTION_FIELDS
+    id_fields = (id_field,) if id_field else ID_FIELDS
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+            except json.JSONDecodeError as e:
+                print(f"Skipping line {line_number}: {e}", file=sys.stderr)
+                continue
+            question = first_field(item, question_fields)
+            if question is None:
+                print(f"Skipping line {line_number}: no question field", file=sys.stderr)
+                continue
+            yield first_field(item, id_fields) or str(line_number), question
+
+def completed_ids(path: str) -> Set[str]:
+    """Ids already answered in an existing output file; failed items are retried"""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A run killed mid-write can leave a truncated last line
+                continue
+            if "error" not in record:
+                done.add(record["id"])
+    return done
+
+async def answer(agent: ArymalabsAgent, item_id: str, question: str) -> Dict:
+    """Answer one question in a fresh conversation that shares the agent's knowledge base and clients"""
+    session = copy.copy(agent)
+    session.reset_conversation()
+    started = time.perf_counter()
+    try:
+        relevant_content, category = session.user_response_context(question)
+        response = await session.acomplete(question, relevant_content, category)
+    except Exception as e:
+        return {"id": item_id, "question": question, "error": f"{type(e).__name__}: {e}",
+                "latency_ms": round(1000 * (time.perf_counter() - started), 1)}
+    return {
+        "id": item_id,
+        "question": question,
+        "category": category,
+        "answer": response,
+        "source": session.last_response_source,
+        "latency_ms": round(1000 * (time.perf_counter() - started), 1),
+    }
+
+async def run_batch(agent: ArymalabsAgent, questions: Iterator[Tuple[str, str]], output_path: str,
+                    concurrency: int = 8, requests_per_second: float = 2.0, skip: Optional[Set[str]] = None) -> Dict:
+    """Answer questions with at most `concurrency` in flight, appending each result to output_path as it completes"""
+    skip = skip or set()
+    bucket = TokenBucket(requests_per_second, max(1, concurrency)) if requests_per_second > 0 else None
+    # Bounded so a large input file is streamed rather than loaded up front
+    pending: asyncio.Queue = asyncio.Queue(maxsize=2 * concurrency)
+    summary = {"answered": 0, "failed": 0, "skipped": 0, "sources": {}, "latencies": []}
+
+    with open(output_path, 'a', encoding='utf-8') as out:
+        async def worker():
+            while True:
+                item = await pending.get()
+                if item is None:
+                    return
+                if bucket:
+                    await bucket.acquire_async()
+                record = await answer(agent, *item)
+                out.write(json.dumps(record) + "\n")
+                out.flush()
+                if "error" in record:
+                    summary["failed"] += 1
+                else:
+                    summary["answered"] += 1
+                    summary["sources"][record["source"]] = summary["sources"].get(record["source"], 0) + 1
+                    summary["latencies"].append(record["latency_ms"])
+
+        workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+        for item_id, question in questions:
+            if item_id in skip:
+                summary["skipped"] += 1
+                continue
+            await pending.put((item_id, question))
+        for _ in workers:
+            await pending.put(None)
+        await asyncio.gather(*workers)
+    return summary
+
+def percentile(values, fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('input', nargs='?', default='requests.jsonl')
+    parser.add_argument('--output', default='batch_answers.jsonl')
+    parser.add_argument('--concurrency', type=int, default=8, help="questions in flight at once")
+    parser.add_argument('--rps', type=float, default=2.0, help="questions started per second (0 for no limit)")
+    parser.add_argument('--question-field', default=None)
+    parser.add_argument('--id-field', default=None)
+    parser.add_argument('--retrieval-mode', default='bm25', choices=['bm25', 'dense', 'hybrid'])
+    parser.add_argument('--restart', action='store_true', help="ignore answers already in the output file")
+    parser.add_argument('--metrics-file', default=METRICS_PATH or None, help="write Prometheus metrics here when done")
+    parser.add_argument('--verbose', action='store_true', help="show the agent's per-question log")
+    args = parser.parse_args()
+    configure_logging("DEBUG" if args.verbose else "WARNING")
+
+    if args.restart and os.path.exists(args.output):
+        os.remove(args.output)
+    skip = completed_ids(args.output)
+    if skip:
+        print(f"Resuming: {len(skip)} questions already answered in {args.output}", file=sys.stderr)
+
+    agent = ArymalabsAgent(retrieval_mode=args.retrieval_mode)
+    questions = read_questions(args.input, args.question_field, args.id_field)
+    started = time.perf_counter()
+    summary = asyncio.run(run_batch(agent, questions, args.output, args.concurrency, args.rps, skip))
+    elapsed = time.perf_counter() - started
+    if args.metrics_file:
+        METRICS.write(args.metrics_file)
+
+    latencies = summary.pop("latencies")
+    summary["seconds"] = round(elapsed, 2)
+    summary["latency_ms_p50"] = percentile(latencies, 0.5)
+    summary["latency_ms_p95"] = percentile(latencies, 0.95)
+    print(json.dumps(summary, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""Offline crawl benchmark: runs ArymalabsScraper against a generated local site.
+
+    python benchmarks/crawl_benchmark.py --pages 200 --fanout 8 --latency-ms 50
+
+Each run appends one JSON line to benchmarks/results.jsonl so results can be
+compared between versions.
+"""
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from page_cache import PageCache  # noqa: E402
+from web_scraper import ArymalabsScraper  # noqa: E402
+
+WORDS = (
+    "marketing mix modeling mmm service attribution experimentation testing causal inference "
+    "platform product budget optimization roi enterprise media channel model insight"
+).split()
+
+class SyntheticSite:
+    """Deterministic generated site: page i links to fanout pages and carries about page_size bytes of text"""
+
+    def __init__(self, pages: int, fanout: int, page_size: int, seed: int = 0):
+        self.pages = pages
+        self.fanout = fanout
+        self.page_size = page_size
+        self.seed = seed
+        self.cache: Dict[int, bytes] = {}
+
+    def render(self, index: int) -> bytes:
+        if index not in self.cache:
+            rng = random.Random(self.seed * 100003 + index)
+            links = ''.join(
+                f'<li><a href="/page/{rng.randrange(self.pages)}#section">Page link</a></li>'
+                for _ in range(self.fanout)
+            )
+            paragraphs = []
+            size = 0
+            while size < self.page_size:
+                sentence = ' '.join(rng.choice(WORDS) for _ in range(12)).capitalize() + '.'
+                paragraphs.append(f"<h2>Section {len(paragraphs)}</h2><p>{sentence} {sentence}</p>")
+                size += 2 * len(sentence) + 30
+            self.cache[index] = (
+                "<html><head><title>Synthetic</title><style>p {}</style></head><body>"
+                "<nav>Home Solutions Products Case Studies About Us</nav>"
+                f"<h1>Page {index}</h1>{''.join(paragraphs)}<ul>{links}</ul>"
+                "<footer>Copyright Synthetic Labs. All rights reserved.</footer></body></html>"
+            ).encode('utf-8')
+        return self.cache[index]
+
+def make_handler(site: SyntheticSite, latency: float, error_rate: float):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def send_body(self, status: int, body: bytes = b"", headers: Dict[str, str] = None):
+            self.send_response(status)
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if latency:
+                time.sleep(latency)
+            path = self.path.split('?')[0].rstrip('/')
+            if path in ('', '/index.html'):
+                index = 0
+            elif path.startswith('/page/') and path[6:].isdigit() and int(path[6:]) < site.pages:
+                index = int(path[6:])
+            else:
+                self.send_body(404)
+                return
+            # Errors are a pure function of the path so repeated runs are comparable
+            if error_rate and int(hashlib.md5(path.encode()).hexdigest(), 16) % 10000 < error_rate * 10000:
+                self.send_body(503)
+                return
+            body = site.render(index)
+            etag = '"%s"' % hashlib.md5(body).hexdigest()
+            if self.headers.get("If-None-Match") == etag:
+                self.send_body(304, headers={"ETag": etag})
+                return
+            self.send_body(200, body, {"Content-Type": "text/html; charset=utf-8", "ETag": etag})
+
+    return Handler
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process and its parse workers, in MiB"""
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return max(usage, children) / scale
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return "unknown"
+
+def run_crawl(base_url: str, args, cache: PageCache = None) -> Dict:
+    scraper = ArymalabsScraper(
+        base_url, max_workers=args.workers, requests_per_second=args.rps, burst=args.workers,
+        cache=cache, max_pages=args.pages, max_depth=args.depth, use_sitemap=False,
+        parser=args.parser, parse_workers=args.parse_workers
+    )
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = scraper.scrape_website()
+    elapsed = time.perf_counter() - started
+    stats = scraper.stats
+    return {
+        "seconds": round(elapsed, 4),
+        "pages_scraped": result["total_pages_scraped"],
+        "pages_fetched": stats["pages_fetched"],
+        "not_modified": stats["not_modified"],
+        "pages_per_sec": round(result["total_pages_scraped"] / elapsed, 2),
+        "bytes_per_sec": round(stats["bytes_fetched"] / elapsed, 1),
+        "parse_ms_per_page": round(1000 * stats["parse_seconds"] / max(1, stats["pages_parsed"]), 3),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pages', type=int, default=100)
+    parser.add_argument('--fanout', type=int, default=5)
+    parser.add_argument('--page-size', type=int, default=20000, help="approximate text bytes per page")
+    parser.add_argument('--latency-ms', type=float, default=20.0)
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fraction of pages answering 503")
+    parser.add_argument('--recrawl', action='store_true', help="crawl twice with a page cache to exercise 304s")
+    parser.add_argument('--depth', type=int, default=10)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--rps', type=float, default=1000.0, help="per-host politeness budget")
+    parser.add_argument('--parser', default='html.parser')
+    parser.add_argument('--parse-workers', type=int, default=None)
+    parser.add_argument('--output', default=os.path.join(REPO_ROOT, 'benchmarks', 'results.jsonl'))
+    args = parser.parse_args()
+
+    site = SyntheticSite(args.pages, args.fanout, args.page_size)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(site, args.latency_ms / 1000, args.error_rate))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    try:
+        runs = {}
+        if args.recrawl:
+            with tempfile.TemporaryDirectory() as tmp:
+                cache = PageCache(os.path.join(tmp, 'page_cache.json'))
+                runs["cold"] = run_crawl(base_url, args, cache)
+                runs["recrawl"] = run_crawl(base_url, args, cache)
+        else:
+            runs["cold"] = run_crawl(base_url, args)
+    finally:
+        server.shutdown()
+
+    report = {
+        "benchmark": "crawl",
+        "revision": git_revision(),
+        "timestamp": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "config": {key: value for key, value in vars(args).items() if key != 'output'},
+        "runs": runs,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+    with open(args.output, 'a') as f:
+        f.write(json.dumps(report) + "\n")
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""Cold start benchmark: import time of the app's modules and time to the first agent session.
+
+    python benchmarks/startup_benchmark.py --runs 5 --sections 500
+
+Every measurement runs in a fresh interpreter. Import times come from
+`python -X importtime`; session times from constructing ArymalabsAgent twice
+over a generated scraped_content.json (the first session loads the shared
+knowledge base, the second reuses it). Each run appends one JSON line to
+benchmarks/results.jsonl so results can be compared between versions.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from crawl_benchmark import WORDS, git_revision  # noqa: E402
+
+# What `streamlit run app.py` imports from this repo before the first page is drawn
+APP_MODULES = ("config", "metrics", "ai_agent", "refresh_scheduler")
+
+SESSION_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+from ai_agent import ArymalabsAgent
+imported = time.perf_counter()
+ArymalabsAgent(knowledge_store_path="")
+first = time.perf_counter()
+ArymalabsAgent(knowledge_store_path="")
+second = time.perf_counter()
+print(json.dumps({"import_ms": 1000 * (imported - started), "first_session_ms": 1000 * (first - imported),
+                  "next_session_ms": 1000 * (second - first), "modules_loaded": len(sys.modules)}))
+"""
+
+def parse_importtime(stderr: str) -> Dict[str, Dict[str, int]]:
+    """Map module name to self and cumulative import microseconds from -X importtime output"""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = {"self_us": int(self_us), "cumulative_us": int(cumulative_us),
+                                 "top_level": not name[1:].startswith(" ")}
+    return modules
+
+def import_profile(modules: List[str], runs: int, top: int) -> Dict:
+    """Median wall time of a fresh interpreter importing modules, and the slowest imports of the last run"""
+    command = [sys.executable, "-X", "importtime", "-c", "import " + ", ".join(modules)]
+    wall_ms, import_ms = [], []
+    for _ in range(runs):
+        started = time.perf_counter()
+        completed = subprocess.run(command, cwd=REPO_ROOT, capture_output=True, text=True, check=True)
+        wall_ms.append(1000 * (time.perf_counter() - started))
+        profile = parse_importtime(completed.stderr)
+        import_ms.append(sum(item["cumulative_us"] for item in profile.values() if item["top_level"]) / 1000)
+    slowest = sorted(profile.items(), key=lambda item: item[1]["self_us"], reverse=True)[:top]
+    return {
+        "wall_ms": round(statistics.median(wall_ms), 1),
+        "import_ms": round(statistics.median(import_ms), 1),
+        "modules": len(profile),
+        "heavy_modules_loaded": sorted(name for name in ("numpy", "httpx", "bs4", "web_scraper", "dotenv")
+                                       if name in profile),
+        "slowest_self_ms": {name: round(item["self_us"] / 1000, 2) for name, item in slowest},
+    }
+
+def write_scraped_content(path: str, sections: int, seed: int = 0):
+    rng = random.Random(seed)
+    def sentence():
+        return ' '.join(rng.choice(WORDS) for _ in range(12)).capitalize() + '.'
+    data = {
+        "main_content": ' '.join(sentence() for _ in range(40)),
+        "sections": [
+            {"url": f"https://example.com/page/{i // 5}", "heading_path": [f"Page {i // 5}", f"Section {i}"],
+             "text": ' '.join(sentence() for _ in range(8))}
+            for i in range(sections)
+        ],
+        "categorized_content": {
+            category: [sentence() for _ in range(20)]
+            for category in ("MMM_SERVICES", "MMM_PRODUCTS", "EXPERIMENTATION_PRODUCTS")
+        },
+    }
+    with open(path, 'w') as f:
+        json.dump(data, f)
+
+def session_startup(sections: int, runs: int) -> Dict:
+    """Median import, first-session and next-session times in fresh interpreters"""
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        write_scraped_content(os.path.join(tmp, 'scraped_content.json'), sections)
+        env = dict(os.environ, PYTHONPATH=REPO_ROOT, KB_RELOAD_INTERVAL="0", RESPONSE_CACHE_PATH="")
+        for _ in range(runs):
+            completed = subprocess.run([sys.executable, "-c", SESSION_SCRIPT], cwd=tmp, env=env,
+                                       capture_output=True, text=True, check=True)
+            results.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+    return {key: round(statistics.median(run[key] for run in results), 2) for key in results[0]}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5, help="fresh interpreters per measurement")
+    parser.add_argument('--sections', type=int, default=500, help="sections in the generated scraped_content.json")
+    parser.add_argument('--top', type=int, default=10, help="slowest modules to report")
+    parser.add_argument('--output', default=os.path.join(REPO_ROOT, 'benchmarks', 'results.jsonl'))
+    args = parser.parse_args()
+
+    report = {
+        "benchmark": "startup",
+        "revision": git_revision(),
+        "timestamp": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "config": {key: value for key, value in vars(args).items() if key != 'output'},
+        "python": sys.version.split()[0],
+        "imports": import_profile(list(APP_MODULES), args.runs, args.top),
+        "sessions": session_startup(args.sections, args.runs),
+    }
+    with open(args.output, 'a') as f:
+        f.write(json.dumps(report) + "\n")
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
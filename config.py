@@ -1,10 +1,25 @@
 import os
-from dotenv import load_dotenv
 
-load_dotenv()
+# Only pay for importing python-dotenv when there is a .env file to read
+ENV_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".env")
+if os.path.exists(ENV_FILE) or os.path.exists(".env"):
+    from dotenv import load_dotenv
+    load_dotenv(ENV_FILE if os.path.exists(ENV_FILE) else ".env")
 
 # API configuration
 HUGGINGFACE_API_KEY = os.getenv("HUGGINGFACE_API_KEY")  # Free Hugging Face API
+LLM_API_URL = "https://router.huggingface.co/v1/chat/completions"
+LLM_MODEL = "openai/gpt-oss-120b:cerebras"
+LLM_CONTEXT_WINDOW = int(os.getenv("LLM_CONTEXT_WINDOW", "131072"))  # tokens the model accepts in total
+LLM_MAX_TOKENS = int(os.getenv("LLM_MAX_TOKENS", "800"))  # tokens reserved for the answer
+PROMPT_CONTEXT_TOKENS = int(os.getenv("PROMPT_CONTEXT_TOKENS", "250"))  # cap on retrieved content per prompt
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "3.05"))  # seconds
+LLM_READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", "30"))  # seconds
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_BREAKER_THRESHOLD = int(os.getenv("LLM_BREAKER_THRESHOLD", "3"))  # consecutive failures before failing fast
+LLM_BREAKER_RESET = float(os.getenv("LLM_BREAKER_RESET", "30"))  # seconds before a trial request
+# Latency SLO: answer from the fallback if the router has not answered (or started streaming) by then; 0 disables
+RESPONSE_DEADLINE = float(os.getenv("RESPONSE_DEADLINE", "0"))  # seconds
 
 # Website configuration
 WEBSITE_URL = "https://www.arymalabs.com"
@@ -16,3 +31,36 @@ CATEGORIES = {
     "MMM_PRODUCTS": "MMM Products", 
     "EXPERIMENTATION_PRODUCTS": "Experimentation Products"
 }
+
+# LLM response cache (set RESPONSE_CACHE_PATH to an empty string to keep it in memory only)
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "512"))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "3600"))  # seconds
+RESPONSE_CACHE_PATH = os.getenv("RESPONSE_CACHE_PATH", "response_cache.db")
+
+# Knowledge base shared by all sessions: how often to check the scraped files for changes (0 disables reloading)
+KB_RELOAD_INTERVAL = float(os.getenv("KB_RELOAD_INTERVAL", "5"))  # seconds
+# Background re-crawl in the app: every REFRESH_INTERVAL seconds (0 disables), spread by +/- REFRESH_JITTER of it
+REFRESH_INTERVAL = float(os.getenv("REFRESH_INTERVAL", "21600"))  # seconds
+REFRESH_JITTER = float(os.getenv("REFRESH_JITTER", "0.1"))
+REFRESH_PARSE_WORKERS = int(os.getenv("REFRESH_PARSE_WORKERS", "1"))  # parse processes for a background crawl
+REFRESH_NICE = int(os.getenv("REFRESH_NICE", "10"))  # niceness of the background crawl, so chat requests come first
+
+# Sidebar quick actions, always kept warm: answered ahead of time after every knowledge base load
+QUICK_ACTIONS = {
+    "about": "Tell me about Aryma Labs",
+    "services": "I'm interested in MMM Services",
+    "products": "I'm interested in MMM Products",
+    "experimentation": "I'm interested in Experimentation Products",
+    "demo": "I want to request a demo"
+}
+WARM_ANSWERS_PATH = os.getenv("WARM_ANSWERS_PATH", "warm_answers.db")  # empty keeps warm answers in memory
+WARM_ANSWER_TTL = float(os.getenv("WARM_ANSWER_TTL", "86400"))  # seconds before a warm answer is regenerated
+WARM_TOP_QUERIES = int(os.getenv("WARM_TOP_QUERIES", "20"))  # most frequent past questions also kept warm
+
+# Chat transcript: messages shown before a "show earlier" control, grown by this much per click
+CHAT_HISTORY_WINDOW = int(os.getenv("CHAT_HISTORY_WINDOW", "20"))
+
+# Observability: log level for the agent, and where to expose Prometheus metrics (unset to disable)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "WARNING")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))  # serve /metrics on this port when non-zero
+METRICS_PATH = os.getenv("METRICS_PATH", "")  # or write the metrics text to this file
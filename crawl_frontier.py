@@ -0,0 +1,90 @@
+import xml.etree.ElementTree as ET
+from collections import deque
+from typing import Iterable, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+def canonicalize_url(url: str, base_url: Optional[str] = None) -> Optional[str]:
+    """Resolve a URL against base_url and normalize it so equivalent URLs compare equal
+
+    Lowercases scheme and host, drops default ports and fragments, sorts the query
+    string and strips trailing slashes (the root path is always "/"). Returns None
+    for non-HTTP links such as mailto: or javascript:.
+    """
+    if base_url:
+        url = urljoin(base_url, url.strip())
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    if scheme not in DEFAULT_PORTS or not parts.hostname:
+        return None
+
+    host = parts.hostname.lower()
+    if parts.port and parts.port != DEFAULT_PORTS[scheme]:
+        host = f"{host}:{parts.port}"
+
+    path = parts.path or "/"
+    if len(path) > 1:
+        path = path.rstrip("/") or "/"
+
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, path, query, ""))
+
+def same_site(url: str, base_url: str) -> bool:
+    """Return True if url is on the same host as base_url, ignoring a leading www."""
+    def host(value: str) -> str:
+        netloc = urlsplit(value).netloc.lower()
+        return netloc[4:] if netloc.startswith("www.") else netloc
+    return host(url) == host(base_url)
+
+def parse_sitemap(xml_content: bytes) -> Tuple[List[str], List[str]]:
+    """Parse a sitemap or sitemap index, returning (page URLs, nested sitemap URLs)"""
+    try:
+        root = ET.fromstring(xml_content)
+    except ET.ParseError:
+        return [], []
+    locs = [element.text.strip() for element in root.iter() if element.tag.endswith("loc") and element.text]
+    if root.tag.endswith("sitemapindex"):
+        return [], locs
+    return locs, []
+
+class CrawlFrontier:
+    """Breadth-first crawl frontier with URL canonicalization, O(1) dedup and depth/page budgets"""
+
+    def __init__(self, base_url: str, max_depth: int = 3, max_pages: int = 25):
+        self.base_url = canonicalize_url(base_url)
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        self.seen = set()
+        self.queue = deque()
+        self.dispatched = 0
+
+    def add(self, url: str, depth: int, base_url: Optional[str] = None) -> bool:
+        """Enqueue a URL if it is internal, within the depth limit and not seen before"""
+        if depth > self.max_depth:
+            return False
+        url = canonicalize_url(url, base_url)
+        if not url or url in self.seen or not same_site(url, self.base_url):
+            return False
+        self.seen.add(url)
+        self.queue.append((url, depth))
+        return True
+
+    def add_all(self, urls: Iterable[str], depth: int, base_url: Optional[str] = None) -> int:
+        """Enqueue several URLs, returning how many were new"""
+        return sum(1 for url in urls if self.add(url, depth, base_url))
+
+    def next_batch(self) -> List[Tuple[str, int]]:
+        """Pop every queued URL at the shallowest depth, limited by the remaining page budget"""
+        batch = []
+        if not self.queue:
+            return batch
+        depth = self.queue[0][1]
+        while self.queue and self.queue[0][1] == depth and self.dispatched < self.max_pages:
+            batch.append(self.queue.popleft())
+            self.dispatched += 1
+        return batch
+
+    @property
+    def exhausted(self) -> bool:
+        return not self.queue or self.dispatched >= self.max_pages
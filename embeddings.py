@@ -0,0 +1,170 @@
+import json
+import logging
+import math
+import os
+import zlib
+from typing import BinaryIO, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from knowledge_store import KnowledgeStore
+from retrieval import tokenize
+
+logger = logging.getLogger(__name__)
+
+class HashingEmbedder:
+    """Offline text embedder using signed feature hashing of words, word prefixes and bigrams
+
+    Needs no model download or network access, and hashes with CRC32 so vectors built
+    by the scraper and by the agent process agree.
+    """
+
+    def __init__(self, dim: int = 1024, prefix_length: int = 4):
+        self.dim = dim
+        self.prefix_length = prefix_length
+
+    def features(self, text: str) -> Dict[str, float]:
+        tokens = tokenize(text)
+        weights: Dict[str, float] = {}
+        for token in tokens:
+            weights[token] = weights.get(token, 0.0) + 1.0
+            # Shared prefixes let "test", "tests" and "testing" land close together
+            if len(token) >= self.prefix_length:
+                prefix = "#" + token[:self.prefix_length]
+                weights[prefix] = weights.get(prefix, 0.0) + 0.5
+        for first, second in zip(tokens, tokens[1:]):
+            bigram = f"{first} {second}"
+            weights[bigram] = weights.get(bigram, 0.0) + 0.5
+        return weights
+
+    def embed(self, text: str) -> np.ndarray:
+        """Return an L2-normalized float32 vector for text (all zeros if it has no features)"""
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature, weight in self.features(text).items():
+            h = zlib.crc32(feature.encode('utf-8'))
+            vector[h % self.dim] += (1.0 + math.log(weight)) * (1.0 if h & 0x80000000 else -1.0)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def embed_batch(self, texts: Sequence[str]) -> np.ndarray:
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            matrix[row] = self.embed(text)
+        return matrix
+
+def spherical_kmeans(matrix: np.ndarray, n_clusters: int, iterations: int = 10, seed: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """Cluster unit vectors by cosine similarity, returning (centroids, assignments)"""
+    rng = np.random.default_rng(seed)
+    centroids = matrix[rng.choice(len(matrix), n_clusters, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = np.argmax(matrix @ centroids.T, axis=1)
+        for cluster in range(n_clusters):
+            members = matrix[assignments == cluster]
+            if len(members):
+                centroid = members.sum(axis=0)
+                norm = np.linalg.norm(centroid)
+                if norm:
+                    centroids[cluster] = centroid / norm
+    return centroids, np.argmax(matrix @ centroids.T, axis=1)
+
+def build_vector_index(ids: Sequence[int], texts: Sequence[str], path_prefix: str = "knowledge_vectors",
+                       embedder: Optional[HashingEmbedder] = None, n_clusters: Optional[int] = None) -> int:
+    """Embed texts and write a contiguous float32 matrix plus metadata for VectorIndex
+
+    Rows are grouped by coarse cluster so a probed cluster is one contiguous slice. By
+    default clustering is used only once there are enough rows for it to pay off.
+    Returns the number of rows written.
+    """
+    embedder = embedder or HashingEmbedder()
+    matrix = embedder.embed_batch(texts)
+    ids = np.asarray(ids, dtype=np.int64)
+    if n_clusters is None:
+        n_clusters = int(math.sqrt(len(texts))) if len(texts) >= 2000 else 0
+
+    meta = {"dim": embedder.dim, "prefix_length": embedder.prefix_length, "offsets": []}
+    centroids = None
+    if n_clusters:
+        centroids, assignments = spherical_kmeans(matrix, n_clusters)
+        order = np.argsort(assignments, kind='stable')
+        matrix, ids = matrix[order], ids[order]
+        meta["offsets"] = np.searchsorted(assignments[order], np.arange(n_clusters + 1)).tolist()
+    meta["ids"] = ids.tolist()
+
+    # Running agents memory-map the matrix, so files are replaced by rename (the open
+    # mapping keeps the old inode) and never rewritten in place. The metadata goes last:
+    # VectorIndex rejects a matrix whose row count does not match it.
+    replace_file(f"{path_prefix}.npy", lambda f: np.save(f, matrix))
+    if centroids is not None:
+        replace_file(f"{path_prefix}.centroids.npy", lambda f: np.save(f, centroids))
+    replace_file(f"{path_prefix}.json", lambda f: f.write(json.dumps(meta).encode('utf-8')))
+    if centroids is None and os.path.exists(f"{path_prefix}.centroids.npy"):
+        os.remove(f"{path_prefix}.centroids.npy")
+    return len(ids)
+
+def replace_file(path: str, write: Callable[[BinaryIO], object]):
+    """Write a file under a temporary name and rename it over path"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+def build_vector_index_from_store(store: KnowledgeStore, path_prefix: str = "knowledge_vectors") -> int:
+    """Embed every chunk of the knowledge store (with its section heading) into a vector index"""
+    chunks = store.iter_chunks()
+    return build_vector_index(
+        [chunk["id"] for chunk in chunks],
+        [f"{chunk['section']} {chunk['text']}" for chunk in chunks],
+        path_prefix
+    )
+
+class VectorIndex:
+    """Memory-mapped dense index answering queries with one matrix-vector product and argpartition"""
+
+    def __init__(self, path_prefix: str = "knowledge_vectors"):
+        with open(f"{path_prefix}.json", 'r') as f:
+            meta = json.load(f)
+        self.embedder = HashingEmbedder(meta["dim"], meta["prefix_length"])
+        self.ids = np.asarray(meta["ids"], dtype=np.int64)
+        self.offsets = meta["offsets"]
+        self.matrix = np.load(f"{path_prefix}.npy", mmap_mode='r')
+        self.centroids = np.load(f"{path_prefix}.centroids.npy") if self.offsets else None
+        # Opened between the renames of a rebuild: the files belong to different versions
+        if len(self.matrix) != len(self.ids) or (self.offsets and len(self.centroids) != len(self.offsets) - 1):
+            raise ValueError("vector index files do not match; rebuild in progress")
+
+    @classmethod
+    def open(cls, path_prefix: str = "knowledge_vectors") -> Optional["VectorIndex"]:
+        """Load the index if the scraper has built one"""
+        if not os.path.exists(f"{path_prefix}.npy"):
+            return None
+        try:
+            return cls(path_prefix)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning("could not load vector index %s: %s", path_prefix, e)
+            return None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def search(self, query: str, k: int = 5, nprobe: int = 4) -> List[Tuple[int, float]]:
+        """Return up to k (chunk_id, cosine score) pairs, best first"""
+        if not len(self.ids):
+            return []
+        vector = self.embedder.embed(query)
+        if not vector.any():
+            return []
+
+        if self.centroids is not None:
+            # Only score the rows of the nprobe clusters nearest to the query
+            probes = np.argsort(self.centroids @ vector)[::-1][:nprobe]
+            rows = np.concatenate([np.arange(self.offsets[c], self.offsets[c + 1]) for c in probes])
+            scores = self.matrix[rows] @ vector
+        else:
+            rows = None
+            scores = self.matrix @ vector
+
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        positions = rows[top] if rows is not None else top
+        return [(int(self.ids[p]), float(scores[t])) for p, t in zip(positions, top)]
@@ -0,0 +1,94 @@
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, NamedTuple, Optional
+
+from keyword_matcher import KeywordMatcher
+
+# Words that place a message in a product category
+CATEGORY_RULES = {
+    "MMM_SERVICES": ["service", "services", "mmm service", "mmm services", "consulting"],
+    "MMM_PRODUCTS": ["product", "products", "mmm product", "mmm products", "tool", "tools", "platform"],
+    "EXPERIMENTATION_PRODUCTS": [
+        "experiment", "experimentation", "experimentation products", "testing", "a/b test"
+    ],
+}
+
+# What the user wants to know, checked in this order when several match
+SUB_INTENT_RULES = {
+    "founder": ["founder", "ceo", "leadership"],
+    "pricing": ["price", "pricing", "cost"],
+    "contact": ["contact", "demo", "how to contact"],
+    "how": ["how"],
+    "about": ["about", "what is", "what", "tell me"],
+}
+
+# Questions about the company as a whole rather than one category
+GENERAL_PHRASES = [
+    "about aryma", "what is aryma", "tell me about aryma", "who is aryma",
+    "company", "company info", "about the company", "what does aryma do",
+    "overview", "introduction", "background", "history", "contact",
+    "how to contact", "where is aryma", "aryma labs", "more information"
+]
+
+class Intent(NamedTuple):
+    category: Optional[str]
+    sub_intent: Optional[str]
+    confidence: float
+    general: bool
+    labels: FrozenSet[str]
+
+class IntentRouter:
+    """Classify a message into category, sub-intent and general-query flag in one matcher pass
+
+    All rules are compiled into a single Aho-Corasick automaton, so the cost of routing
+    depends on the message length, not on the number of rules. Keywords must start at a
+    word boundary ("how" does not match "show") but may continue into a longer word
+    ("experiment" matches "experimentation").
+    """
+
+    def __init__(self, category_rules: Dict[str, List[str]] = CATEGORY_RULES,
+                 sub_intent_rules: Dict[str, List[str]] = SUB_INTENT_RULES,
+                 general_phrases: List[str] = GENERAL_PHRASES, cache_size: int = 1024):
+        self.matcher = KeywordMatcher()
+        for category, keywords in category_rules.items():
+            for keyword in keywords:
+                self.matcher.add(keyword, f"category:{category}")
+        for sub_intent, keywords in sub_intent_rules.items():
+            for keyword in keywords:
+                self.matcher.add(keyword, f"intent:{sub_intent}")
+        for phrase in general_phrases:
+            self.matcher.add(phrase, "general")
+        self.matcher.add("mmm", "mmm")
+        self.matcher.build()
+        self.sub_intent_order = list(sub_intent_rules)
+        # Several stages of one message ask about the same text; only the first pays for matching
+        self.classify = lru_cache(maxsize=cache_size)(self._classify)
+
+    def _classify(self, text: str) -> Intent:
+        text = text.lower()
+        scores: Dict[str, int] = {}
+        labels = set()
+        for end, keyword, label in self.matcher.iter_matches(text):
+            start = end - len(keyword) + 1
+            if start and text[start - 1].isalnum():
+                continue
+            labels.add(label)
+            if label.startswith("category:"):
+                # Longer, more specific phrases ("experimentation products") outweigh generic words ("product")
+                scores[label[9:]] = scores.get(label[9:], 0) + len(keyword)
+
+        if scores:
+            category = max(scores, key=scores.get)
+            confidence = scores[category] / sum(scores.values())
+        elif "mmm" in labels:
+            # "MMM" on its own most often means the modeling service
+            category, confidence = "MMM_SERVICES", 0.5
+        else:
+            category, confidence = None, 0.0
+        sub_intent = next((name for name in self.sub_intent_order if f"intent:{name}" in labels), None)
+        return Intent(category, sub_intent, round(confidence, 3), "general" in labels, frozenset(labels))
+
+INTENT_ROUTER = IntentRouter()
+
+def classify_intent(text: str) -> Intent:
+    """Classify a user message with the shared router"""
+    return INTENT_ROUTER.classify(text)
@@ -0,0 +1,69 @@
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, Set, Tuple
+
+class KeywordMatcher:
+    """Aho-Corasick automaton that finds every keyword of every label in one pass over the text"""
+
+    def __init__(self, keywords_by_label: Dict[str, Iterable[str]] = None):
+        # Node 0 is the root; each node has goto edges, a failure link and the (keyword, label) pairs ending there
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.output: List[List[Tuple[str, str]]] = [[]]
+        self.built = False
+        for label, keywords in (keywords_by_label or {}).items():
+            for keyword in keywords:
+                self.add(keyword, label)
+        self.build()
+
+    def add(self, keyword: str, label: str):
+        """Add a keyword for a label (keywords are matched case-sensitively; pass lowercase)"""
+        node = 0
+        for char in keyword:
+            next_node = self.goto[node].get(char)
+            if next_node is None:
+                next_node = len(self.goto)
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append([])
+                self.goto[node][char] = next_node
+            node = next_node
+        self.output[node].append((keyword, label))
+        self.built = False
+
+    def build(self):
+        """Compute failure links breadth-first and merge outputs along them"""
+        queue = deque(self.goto[0].values())
+        for node in queue:
+            self.fail[node] = 0
+        while queue:
+            node = queue.popleft()
+            for char, child in self.goto[node].items():
+                queue.append(child)
+                state = self.fail[node]
+                while state and char not in self.goto[state]:
+                    state = self.fail[state]
+                self.fail[child] = self.goto[state].get(char, 0)
+                self.output[child] = self.output[child] + self.output[self.fail[child]]
+        self.built = True
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, str, str]]:
+        """Yield (end_index, keyword, label) for every keyword occurrence in text"""
+        if not self.built:
+            self.build()
+        goto, fail, output = self.goto, self.fail, self.output
+        node = 0
+        for index, char in enumerate(text):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if output[node]:
+                for keyword, label in output[node]:
+                    yield index, keyword, label
+
+    def labels(self, text: str) -> Set[str]:
+        """Return the set of labels with at least one keyword in text"""
+        return {label for _, _, label in self.iter_matches(text)}
+
+    def keywords(self, text: str) -> Set[str]:
+        """Return the set of keywords that occur in text"""
+        return {keyword for _, keyword, _ in self.iter_matches(text)}
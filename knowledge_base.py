@@ -0,0 +1,168 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from config import KB_RELOAD_INTERVAL
+from knowledge_store import KnowledgeStore
+from metrics import KB_RELOADS
+from retrieval import BM25Index, StoreRetriever, passages_from_scraped_data
+
+logger = logging.getLogger(__name__)
+
+EMPTY_SCRAPED_DATA = {"main_content": "", "categorized_content": {}, "sections": {}}
+
+def open_knowledge_store(file_path: str) -> Optional[KnowledgeStore]:
+    """Open the chunk store if the scraper has built one"""
+    if not file_path or not os.path.exists(file_path):
+        return None
+    try:
+        return KnowledgeStore(file_path)
+    except Exception as e:
+        logger.warning("Could not open knowledge store %s: %s", file_path, e)
+        return None
+
+def load_scraped_data(file_path: str) -> Dict:
+    """Load scraped data from JSON file"""
+    try:
+        with open(file_path, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        logger.warning("Scraped data file %s not found. Please run the scraper first.", file_path)
+        return dict(EMPTY_SCRAPED_DATA)
+
+class KnowledgeBase:
+    """One loaded version of the scraped content with its retrieval indexes
+
+    Never modified after loading, so any number of sessions and threads can read it
+    without locks; a reload builds a new instance instead. Its store connection stays on
+    the file it opened: updates write a copy and rename it over knowledge.db.
+    """
+
+    __slots__ = ("store", "scraped_data", "version", "retriever", "vectors", "loaded_at")
+
+    def __init__(self, scraped_data_path: str = "scraped_content.json", knowledge_store_path: str = "knowledge.db",
+                 vector_index_path: Optional[str] = None):
+        # Prefer the chunk store, which is queried per message; fall back to the monolithic JSON file
+        self.store = open_knowledge_store(knowledge_store_path)
+        if self.store:
+            self.scraped_data = {"main_content": self.store.get_meta("main_content"), "categorized_content": {}, "sections": {}}
+            self.version = self.store.content_version()
+        else:
+            self.scraped_data = load_scraped_data(scraped_data_path)
+            self.version = hashlib.sha256(json.dumps(self.scraped_data, sort_keys=True).encode('utf-8')).hexdigest()
+        # The store ranks chunks with its own FTS5 index and is read per query; without one,
+        # an in-memory inverted index is built over the JSON content
+        if self.store:
+            self.retriever = StoreRetriever(self.store)
+        else:
+            self.retriever = BM25Index(passages_from_scraped_data(self.scraped_data))
+        # Dense vectors reference store chunk ids, so they are only used alongside the store
+        self.vectors = None
+        if self.store and vector_index_path:
+            # numpy is only imported when dense retrieval is enabled
+            from embeddings import VectorIndex
+            self.vectors = VectorIndex.open(vector_index_path)
+        self.loaded_at = time.time()
+
+class SharedKnowledgeBase:
+    """Process-wide holder of the current KnowledgeBase, reloaded in the background when its files change
+
+    Sessions read `current` on every message. A reload builds the new version completely
+    before replacing the reference in one assignment, so a reader sees either the old
+    knowledge base or the new one, never a partly loaded one.
+    """
+
+    def __init__(self, scraped_data_path: str = "scraped_content.json", knowledge_store_path: str = "knowledge.db",
+                 vector_index_path: Optional[str] = None, reload_interval: float = KB_RELOAD_INTERVAL):
+        self.scraped_data_path = scraped_data_path
+        self.knowledge_store_path = knowledge_store_path
+        self.vector_index_path = vector_index_path
+        self.reload_interval = reload_interval
+        self.reload_lock = threading.Lock()
+        self.last_error: Optional[str] = None
+        self.listeners: List[Callable[[KnowledgeBase], None]] = []
+        self.signature = self.file_signature()
+        self.current = KnowledgeBase(scraped_data_path, knowledge_store_path, vector_index_path)
+        self.watcher: Optional[threading.Thread] = None
+        if reload_interval > 0:
+            self.watcher = threading.Thread(target=self.watch, name="kb-watcher", daemon=True)
+            self.watcher.start()
+
+    def on_reload(self, callback: Callable[[KnowledgeBase], None]):
+        """Call callback with the new version after every reload that swaps one in"""
+        self.listeners.append(callback)
+
+    def watched_files(self) -> Tuple[str, ...]:
+        files = [self.scraped_data_path]
+        if self.knowledge_store_path:
+            files += [self.knowledge_store_path, f"{self.knowledge_store_path}-wal"]
+        if self.vector_index_path:
+            files += [f"{self.vector_index_path}.json", f"{self.vector_index_path}.npy"]
+        return tuple(path for path in files if path)
+
+    def file_signature(self) -> Tuple:
+        """Size and modification time of every file the knowledge base is loaded from"""
+        signature = []
+        for path in self.watched_files():
+            try:
+                stat = os.stat(path)
+                signature.append((path, stat.st_size, stat.st_mtime_ns))
+            except OSError:
+                signature.append((path, None, None))
+        return tuple(signature)
+
+    def reload(self, force: bool = False) -> bool:
+        """Load the files again and swap the new version in if the content changed"""
+        with self.reload_lock:
+            signature = self.file_signature()
+            try:
+                loaded = KnowledgeBase(self.scraped_data_path, self.knowledge_store_path, self.vector_index_path)
+            except Exception as e:
+                # Keep serving the version already loaded; the next change is tried again
+                self.last_error = f"{type(e).__name__}: {e}"
+                logger.warning("knowledge base reload failed: %s", self.last_error)
+                return False
+            self.signature = signature
+            self.last_error = None
+            if loaded.version == self.current.version and not force:
+                return False
+            previous = self.current.version
+            self.current = loaded
+            KB_RELOADS.inc()
+            logger.info("knowledge base reloaded version=%.12s previous=%.12s", loaded.version, previous)
+        for callback in self.listeners:
+            try:
+                callback(loaded)
+            except Exception:
+                logger.exception("knowledge base reload listener failed")
+        return True
+
+    def watch(self):
+        """Poll the files; reload once a change has stopped changing for one interval (the scraper is done writing)"""
+        pending = None
+        while True:
+            time.sleep(self.reload_interval)
+            signature = self.file_signature()
+            if signature == self.signature:
+                pending = None
+            elif signature == pending:
+                self.reload()
+                pending = None
+            else:
+                pending = signature
+
+_shared: Dict[Tuple, SharedKnowledgeBase] = {}
+_shared_lock = threading.Lock()
+
+def shared_knowledge_base(scraped_data_path: str = "scraped_content.json", knowledge_store_path: str = "knowledge.db",
+                          vector_index_path: Optional[str] = None) -> SharedKnowledgeBase:
+    """The process-wide knowledge base for these files, loaded on first use and shared by every session"""
+    key = (scraped_data_path, knowledge_store_path, vector_index_path)
+    with _shared_lock:
+        if key not in _shared:
+            _shared[key] = SharedKnowledgeBase(scraped_data_path, knowledge_store_path, vector_index_path)
+        return _shared[key]
@@ -0,0 +1,300 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from keyword_matcher import KeywordMatcher
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    url TEXT PRIMARY KEY,
+    content_hash TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS chunks (
+    id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL,
+    section TEXT NOT NULL DEFAULT '',
+    position INTEGER NOT NULL,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS chunks_url ON chunks(url);
+CREATE TABLE IF NOT EXISTS chunk_categories (
+    chunk_id INTEGER NOT NULL,
+    category TEXT NOT NULL,
+    PRIMARY KEY (category, chunk_id)
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5(text, content='chunks', content_rowid='id');
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+WORD = re.compile(r'\w+')
+
+def chunk_text(text: str, max_chars: int = 800) -> List[str]:
+    """Split text into chunks of whole sentences, each at most max_chars where possible"""
+    chunks = []
+    current = []
+    length = 0
+    for sentence in SENTENCE_END.split(text):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        if current and length + len(sentence) + 1 > max_chars:
+            chunks.append(' '.join(current))
+            current, length = [], 0
+        current.append(sentence)
+        length += len(sentence) + 1
+    if current:
+        chunks.append(' '.join(current))
+    return chunks
+
+def fts_query(text: str) -> str:
+    """Turn free text into an FTS5 OR-query of quoted terms, so user punctuation cannot break the syntax"""
+    return ' OR '.join(f'"{word}"' for word in dict.fromkeys(WORD.findall(text.lower())))
+
+class KnowledgeStore:
+    """SQLite/FTS5 store of page chunks with URL, section and category metadata
+
+    The agent queries only the chunks it needs, so memory and load time do not grow
+    with the number of crawled pages.
+    """
+
+    def __init__(self, path: str = "knowledge.db"):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def get_meta(self, key: str, default: str = "") -> str:
+        with self.lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row["value"] if row else default
+
+    def set_meta(self, key: str, value: str):
+        with self.lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def content_version(self) -> str:
+        """Hash over every page's content hash; changes whenever any indexed page changes"""
+        with self.lock:
+            rows = self.conn.execute("SELECT url, content_hash FROM pages ORDER BY url").fetchall()
+        digest = hashlib.sha256()
+        for row in rows:
+            digest.update(f"{row['url']}\x1f{row['content_hash']}\n".encode('utf-8'))
+        digest.update(self.get_meta("main_content").encode('utf-8'))
+        return digest.hexdigest()
+
+    def page_hash(self, url: str) -> Optional[str]:
+        with self.lock:
+            row = self.conn.execute("SELECT content_hash FROM pages WHERE url = ?", (url,)).fetchone()
+        return row["content_hash"] if row else None
+
+    def _delete_page(self, url: str):
+        rows = self.conn.execute("SELECT id, text FROM chunks WHERE url = ?", (url,)).fetchall()
+        # External-content FTS tables need the old text to remove their index entries
+        self.conn.executemany("INSERT INTO chunks_fts (chunks_fts, rowid, text) VALUES ('delete', ?, ?)",
+                              [(row["id"], row["text"]) for row in rows])
+        self.conn.executemany("DELETE FROM chunk_categories WHERE chunk_id = ?", [(row["id"],) for row in rows])
+        self.conn.execute("DELETE FROM chunks WHERE url = ?", (url,))
+        self.conn.execute("DELETE FROM pages WHERE url = ?", (url,))
+
+    def replace_page(self, url: str, chunks: List[Dict], content_hash: str) -> bool:
+        """Replace all chunks of a page; chunks are dicts with text, section and categories
+
+        Returns False without touching the database if the page content is unchanged.
+        """
+        if self.page_hash(url) == content_hash:
+            return False
+        with self.lock, self.conn:
+            self._delete_page(url)
+            self.conn.execute("INSERT INTO pages (url, content_hash) VALUES (?, ?)", (url, content_hash))
+            for position, chunk in enumerate(chunks):
+                cursor = self.conn.execute(
+                    "INSERT INTO chunks (url, section, position, text) VALUES (?, ?, ?, ?)",
+                    (url, chunk.get("section", ""), position, chunk["text"])
+                )
+                chunk_id = cursor.lastrowid
+                self.conn.execute("INSERT INTO chunks_fts (rowid, text) VALUES (?, ?)", (chunk_id, chunk["text"]))
+                self.conn.executemany(
+                    "INSERT OR IGNORE INTO chunk_categories (chunk_id, category) VALUES (?, ?)",
+                    [(chunk_id, category) for category in chunk.get("categories", ())]
+                )
+        return True
+
+    def prune(self, keep_urls: Iterable[str]) -> int:
+        """Remove pages that are no longer part of the crawl"""
+        keep = set(keep_urls)
+        with self.lock:
+            stale = [row["url"] for row in self.conn.execute("SELECT url FROM pages") if row["url"] not in keep]
+        with self.lock, self.conn:
+            for url in stale:
+                self._delete_page(url)
+        return len(stale)
+
+    def _rows(self, sql: str, params: tuple) -> List[Dict]:
+        with self.lock:
+            return [dict(row) for row in self.conn.execute(sql, params)]
+
+    def search(self, query: str, category: Optional[str] = None, limit: int = 5) -> List[Dict]:
+        """Full-text search over chunks, best matches first, optionally within one category"""
+        match = fts_query(query)
+        if not match:
+            return []
+        if category:
+            return self._rows(
+                "SELECT c.id, c.url, c.section, c.text FROM chunks_fts f "
+                "JOIN chunks c ON c.id = f.rowid "
+                "JOIN chunk_categories cc ON cc.chunk_id = c.id AND cc.category = ? "
+                "WHERE chunks_fts MATCH ? ORDER BY bm25(chunks_fts) LIMIT ?",
+                (category, match, limit)
+            )
+        return self._rows(
+            "SELECT c.id, c.url, c.section, c.text FROM chunks_fts f "
+            "JOIN chunks c ON c.id = f.rowid "
+            "WHERE chunks_fts MATCH ? ORDER BY bm25(chunks_fts) LIMIT ?",
+            (match, limit)
+        )
+
+    def iter_chunks(self) -> List[Dict]:
+        """Return every chunk in crawl order with its categories as a tuple"""
+        rows = self._rows(
+            "SELECT c.id, c.url, c.section, c.text, group_concat(cc.category) AS categories FROM chunks c "
+            "LEFT JOIN chunk_categories cc ON cc.chunk_id = c.id GROUP BY c.id ORDER BY c.id",
+            ()
+        )
+        for row in rows:
+            row["categories"] = tuple(row["categories"].split(",")) if row["categories"] else ()
+        return rows
+
+    def chunk_count(self) -> int:
+        with self.lock:
+            return self.conn.execute("SELECT count(*) FROM chunks").fetchone()[0]
+
+    def get_chunks(self, ids: List[int]) -> Dict[int, Dict]:
+        """Look up chunks by id, with their categories as a tuple; missing ids are left out"""
+        if not ids:
+            return {}
+        rows = self._rows(
+            "SELECT c.id, c.url, c.section, c.text, group_concat(cc.category) AS categories FROM chunks c "
+            "LEFT JOIN chunk_categories cc ON cc.chunk_id = c.id "
+            f"WHERE c.id IN ({','.join('?' * len(ids))}) GROUP BY c.id",
+            tuple(ids)
+        )
+        for row in rows:
+            row["categories"] = tuple(row["categories"].split(",")) if row["categories"] else ()
+        return {row["id"]: row for row in rows}
+
+    def chunks_for_category(self, category: str, limit: int = 5) -> List[Dict]:
+        """Return the first chunks tagged with a category, in crawl order"""
+        return self._rows(
+            "SELECT c.id, c.url, c.section, c.text FROM chunk_categories cc "
+            "JOIN chunks c ON c.id = cc.chunk_id WHERE cc.category = ? "
+            "ORDER BY c.id LIMIT ?",
+            (category, limit)
+        )
+
+@contextmanager
+def staged_store(path: str = "knowledge.db") -> Iterator[KnowledgeStore]:
+    """Update a copy of the store, then rename it over path in one step
+
+    Each loaded knowledge base keeps its own connection to the file it opened, so it goes
+    on reading one consistent version while the next one is written. If the update
+    raises, the copy is discarded and path is left as it was.
+    """
+    tmp_path = f"{path}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    if os.path.exists(path):
+        source, copy = sqlite3.connect(path), sqlite3.connect(tmp_path)
+        try:
+            source.backup(copy)
+        finally:
+            source.close()
+            copy.close()
+    store = KnowledgeStore(tmp_path)
+    try:
+        yield store
+    except BaseException:
+        store.close()
+        os.remove(tmp_path)
+        raise
+    store.close()
+    os.replace(tmp_path, path)
+
+def build_chunks(text: str, matcher: KeywordMatcher, section: str = "", max_chars: int = 800,
+                 categories: Iterable[str] = ()) -> List[Dict]:
+    """Chunk page text and tag each chunk with the categories whose keywords it contains"""
+    return [
+        {"text": chunk, "section": section, "categories": sorted(matcher.labels(chunk.lower()) | set(categories))}
+        for chunk in chunk_text(text, max_chars)
+    ]
+
+def store_scraped_content(result: Dict, store: KnowledgeStore, matcher: KeywordMatcher) -> int:
+    """Write a scrape result into the store, touching only pages whose text changed
+
+    Returns the number of pages rewritten or removed (no longer in the crawl).
+    """
+    pages = result.get("pages")
+    sections = result.get("sections")
+    if pages and isinstance(sections, list):
+        # Chunk each section separately so every chunk carries its heading path
+        sections_by_url = {page["url"]: [] for page in pages}
+        for section in sections:
+            sections_by_url.setdefault(section["url"], []).append(
+                (" > ".join(section["heading_path"]), section["text"])
+            )
+        pages = [{"url": url, "sections": page_sections} for url, page_sections in sections_by_url.items()]
+    elif pages:
+        pages = [{"url": page["url"], "sections": [("", page["text"])]} for page in pages]
+    else:
+        # Older scrape files and the fallback content only carry main_content and categorized sentences
+        pages = [{"url": "", "sections": [("", result.get("main_content", ""))]}]
+        for category, sentences in result.get("categorized_content", {}).items():
+            if isinstance(sentences, list):
+                sentences = '. '.join(sentence.rstrip('.') for sentence in sentences) + '.'
+            pages.append({"url": f"#{category}", "sections": [("", sentences)], "categories": [category]})
+
+    changed = 0
+    for page in pages:
+        content_hash = hashlib.sha256(json.dumps(page["sections"]).encode('utf-8')).hexdigest()
+        chunks = [
+            chunk
+            for section, text in page["sections"]
+            for chunk in build_chunks(text, matcher, section, categories=page.get("categories", ()))
+        ]
+        if store.replace_page(page["url"], chunks, content_hash):
+            changed += 1
+    changed += store.prune(page["url"] for page in pages)
+    store.set_meta("main_content", result.get("main_content", ""))
+    store.set_meta("boilerplate", result.get("boilerplate", ""))
+    return changed
+
+def main():
+    # Build knowledge.db and its vector index from an existing scraped_content.json without re-crawling
+    from embeddings import build_vector_index_from_store
+    from metrics import configure_logging
+    from web_scraper import CATEGORY_MATCHER
+    configure_logging("INFO")
+    with open('scraped_content.json', 'r') as f:
+        result = json.load(f)
+    with staged_store() as store:
+        changed = store_scraped_content(result, store, CATEGORY_MATCHER)
+        vectors = build_vector_index_from_store(store)
+    logger.info("knowledge store updated pages_changed=%d vectors=%d", changed, vectors)
+
+if __name__ == "__main__":
+    main()
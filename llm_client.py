@@ -0,0 +1,300 @@
+import asyncio
+import json
+import random
+import threading
+import time
+import weakref
+from typing import Dict, Iterator, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import (HUGGINGFACE_API_KEY, LLM_API_URL, LLM_BREAKER_RESET, LLM_BREAKER_THRESHOLD,
+                    LLM_CONNECT_TIMEOUT, LLM_MAX_RETRIES, LLM_READ_TIMEOUT)
+from metrics import BREAKER_TRIPS
+
+RETRYABLE_STATUS = frozenset({429, 500, 502, 503, 504})
+
+class LLMError(Exception):
+    """The chat completion could not be produced; callers should use the keyword fallback"""
+
+class CircuitOpenError(LLMError):
+    """Raised without touching the network while the circuit breaker is open"""
+
+class DeadlineExceeded(LLMError):
+    """The router did not answer within the response deadline; the call carries on in the background"""
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker
+
+    After failure_threshold failed calls the circuit opens and calls are refused for
+    reset_timeout seconds. Then a single trial call is let through (half-open): success
+    closes the circuit, failure opens it again for another reset_timeout.
+    """
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial_in_flight = False
+        self.lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self.lock:
+            if self.opened_at is None:
+                return "closed"
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                return "half_open"
+            return "open"
+
+    def allow(self) -> bool:
+        """Return True if a call may go out now"""
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.reset_timeout or self.trial_in_flight:
+                return False
+            self.trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+
+    def release_trial(self):
+        """Give back a half-open trial that ended without an answer either way, so another can go out"""
+        with self.lock:
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.trial_in_flight or self.failures >= self.failure_threshold:
+                if self.opened_at is None or self.trial_in_flight:
+                    BREAKER_TRIPS.inc()
+                self.opened_at = time.monotonic()
+            self.trial_in_flight = False
+
+def backoff_delay(attempt: int, retry_after: Optional[str], base: float, cap: float) -> float:
+    """Full-jitter exponential backoff, or the server's Retry-After when it is a number of seconds"""
+    if retry_after and retry_after.strip().isdigit():
+        return min(float(retry_after), cap)
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+def message_content(body: Dict) -> str:
+    """Extract the assistant message from a chat completion body, raising LLMError if it is malformed"""
+    try:
+        return body["choices"][0]["message"]["content"] or ""
+    except (KeyError, IndexError, TypeError) as e:
+        raise LLMError(f"malformed response: {e}")
+
+class LLMClient:
+    """Pooled keep-alive client for the Hugging Face chat completions router
+
+    Retries 429/5xx responses and connection errors with jittered exponential backoff
+    (honouring Retry-After), and fails fast through a circuit breaker while the router
+    is unhealthy so users get the fallback answer immediately. Read timeouts are not
+    retried: a hung router would make each request wait read_timeout once per attempt.
+    """
+
+    def __init__(self, api_url: str = LLM_API_URL, api_key: Optional[str] = HUGGINGFACE_API_KEY,
+                 connect_timeout: float = LLM_CONNECT_TIMEOUT, read_timeout: float = LLM_READ_TIMEOUT,
+                 max_retries: int = LLM_MAX_RETRIES, backoff_base: float = 0.5, backoff_max: float = 4.0,
+                 breaker: Optional[CircuitBreaker] = None, pool_size: int = 10):
+        self.api_url = api_url
+        self.api_key = api_key
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = breaker or CircuitBreaker(LLM_BREAKER_THRESHOLD, LLM_BREAKER_RESET)
+        self.session = requests.Session()
+        self.session.headers.update({"Content-Type": "application/json"})
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def backoff(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        return backoff_delay(attempt, retry_after, self.backoff_base, self.backoff_max)
+
+    def post(self, payload: Dict, api_key: Optional[str] = None, stream: bool = False) -> requests.Response:
+        """POST a completion request with retries, returning the 200 response or raising LLMError"""
+        if not self.breaker.allow():
+            raise CircuitOpenError("circuit open, router recently failing")
+        headers = {"Authorization": f"Bearer {api_key or self.api_key}"}
+        error = "no attempt made"
+        for attempt in range(self.max_retries + 1):
+            retry_after = None
+            try:
+                response = self.session.post(self.api_url, headers=headers, json=payload, timeout=self.timeout, stream=stream)
+            except requests.RequestException as e:
+                error = f"{type(e).__name__}: {e}"
+                if isinstance(e, requests.ReadTimeout):
+                    break
+            else:
+                if response.status_code == 200:
+                    return response
+                error = f"HTTP {response.status_code} - {response.text[:100]}"
+                if response.status_code not in RETRYABLE_STATUS:
+                    # Client errors (bad key, bad request) will not improve on retry, but the router did answer
+                    self.breaker.record_success()
+                    raise LLMError(error)
+                retry_after = response.headers.get("Retry-After")
+            if attempt < self.max_retries:
+                time.sleep(self.backoff(attempt, retry_after))
+        self.breaker.record_failure()
+        raise LLMError(error)
+
+    def chat(self, messages: List[Dict[str, str]], model: str, max_tokens: int = 800, temperature: float = 0.7,
+             api_key: Optional[str] = None) -> str:
+        """Return the assistant message for a chat completion, raising LLMError on failure"""
+        payload = {"model": model, "messages": messages, "max_tokens": max_tokens, "temperature": temperature}
+        response = self.post(payload, api_key)
+        try:
+            content = message_content(response.json())
+        except (ValueError, LLMError) as e:
+            self.breaker.record_failure()
+            raise LLMError(str(e))
+        self.breaker.record_success()
+        return content
+
+    def chat_stream(self, messages: List[Dict[str, str]], model: str, max_tokens: int = 800, temperature: float = 0.7,
+                    api_key: Optional[str] = None) -> Iterator[str]:
+        """Yield content deltas of a streamed chat completion as the router sends them
+
+        Retries only happen before the first token; a failure mid-stream raises LLMError
+        after the tokens already yielded.
+        """
+        payload = {"model": model, "messages": messages, "max_tokens": max_tokens, "temperature": temperature,
+                   "stream": True}
+        response = self.post(payload, api_key, stream=True)
+        try:
+            for line in response.iter_lines(chunk_size=None, decode_unicode=True):
+                # Server-sent events: "data: {...}" lines, blank keep-alives, and a final "data: [DONE]"
+                if not line or not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
+                try:
+                    choices = json.loads(data).get("choices") or [{}]
+                except ValueError as e:
+                    raise LLMError(f"malformed stream event: {e}")
+                delta = (choices[0].get("delta") or {}).get("content")
+                if delta:
+                    yield delta
+        except requests.RequestException as e:
+            self.breaker.record_failure()
+            raise LLMError(f"stream interrupted: {type(e).__name__}: {e}")
+        except LLMError:
+            self.breaker.record_failure()
+            raise
+        else:
+            self.breaker.record_success()
+        finally:
+            # Also runs when the consumer stops early; the router answered, so release a half-open trial
+            if self.breaker.trial_in_flight:
+                self.breaker.record_success()
+            response.close()
+
+    def close(self):
+        self.session.close()
+
+class AsyncLLMClient:
+    """asyncio counterpart of LLMClient on a pooled httpx.AsyncClient
+
+    Uses the same retry policy and, by default, the same circuit breaker as the shared
+    synchronous client, so an outage seen by either path fails both fast. An instance
+    belongs to the event loop it is first used on; use shared_async_llm_client().
+    """
+
+    def __init__(self, api_url: str = LLM_API_URL, api_key: Optional[str] = HUGGINGFACE_API_KEY,
+                 connect_timeout: float = LLM_CONNECT_TIMEOUT, read_timeout: float = LLM_READ_TIMEOUT,
+                 max_retries: int = LLM_MAX_RETRIES, backoff_base: float = 0.5, backoff_max: float = 4.0,
+                 breaker: Optional[CircuitBreaker] = None, pool_size: int = 100):
+        self.api_url = api_url
+        self.api_key = api_key
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = breaker or shared_llm_client().breaker
+        # Imported here rather than at module load: only the async API needs httpx, and it is slow to import
+        import httpx
+        self.client = httpx.AsyncClient(
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+            headers={"Content-Type": "application/json"}
+        )
+
+    async def chat(self, messages: List[Dict[str, str]], model: str, max_tokens: int = 800, temperature: float = 0.7,
+                   api_key: Optional[str] = None) -> str:
+        """Return the assistant message for a chat completion, raising LLMError on failure"""
+        import httpx
+        if not self.breaker.allow():
+            raise CircuitOpenError("circuit open, router recently failing")
+        headers = {"Authorization": f"Bearer {api_key or self.api_key}"}
+        payload = {"model": model, "messages": messages, "max_tokens": max_tokens, "temperature": temperature}
+        error = "no attempt made"
+        try:
+            for attempt in range(self.max_retries + 1):
+                retry_after = None
+                try:
+                    response = await self.client.post(self.api_url, headers=headers, json=payload)
+                except httpx.HTTPError as e:
+                    error = f"{type(e).__name__}: {e}"
+                    if isinstance(e, httpx.ReadTimeout):
+                        break
+                else:
+                    if response.status_code == 200:
+                        try:
+                            content = message_content(response.json())
+                        except (ValueError, LLMError) as e:
+                            self.breaker.record_failure()
+                            raise LLMError(str(e))
+                        self.breaker.record_success()
+                        return content
+                    error = f"HTTP {response.status_code} - {response.text[:100]}"
+                    if response.status_code not in RETRYABLE_STATUS:
+                        self.breaker.record_success()
+                        raise LLMError(error)
+                    retry_after = response.headers.get("Retry-After")
+                if attempt < self.max_retries:
+                    await asyncio.sleep(backoff_delay(attempt, retry_after, self.backoff_base, self.backoff_max))
+            self.breaker.record_failure()
+            raise LLMError(error)
+        except BaseException:
+            # Cancelled (deadline race, event loop shutdown) before the router settled the call.
+            # Neither a success nor a failure, but a half-open trial must be handed back: the
+            # breaker is shared with the sync client and would otherwise refuse every call.
+            if self.breaker.trial_in_flight:
+                self.breaker.release_trial()
+            raise
+
+    async def aclose(self):
+        await self.client.aclose()
+
+_shared_client = None
+_shared_client_lock = threading.RLock()
+
+def shared_llm_client() -> LLMClient:
+    """Process-wide client so every session reuses the same connection pool and breaker"""
+    global _shared_client
+    with _shared_client_lock:
+        if _shared_client is None:
+            _shared_client = LLMClient()
+        return _shared_client
+
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncLLMClient]" = weakref.WeakKeyDictionary()
+
+def shared_async_llm_client() -> AsyncLLMClient:
+    """Async client for the running event loop, created on first use and shared by every session on it"""
+    loop = asyncio.get_running_loop()
+    with _shared_client_lock:
+        client = _async_clients.get(loop)
+        if client is None:
+            client = _async_clients[loop] = AsyncLLMClient()
+        return client
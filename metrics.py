@@ -0,0 +1,173 @@
+import bisect
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from config import LOG_LEVEL
+
+# Latency buckets in seconds, from sub-millisecond local stages up to slow LLM calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+def format_labels(labels: LabelKey, extra: str = "") -> str:
+    parts = [f'{name}="{value}"' for name, value in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+class Counter:
+    """Monotonic counter with optional labels"""
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self.values: Dict[LabelKey, float] = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            self.values[key] = self.values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self.values.get(tuple(sorted(labels.items())), 0.0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            for key, value in sorted(self.values.items()):
+                lines.append(f"{self.name}{format_labels(key)} {value:g}")
+        return lines
+
+class Histogram:
+    """Fixed-bucket histogram; an observation is one bisect and three additions under a lock"""
+
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        # Per label set: [per-bucket counts (+Inf last), sum, count]
+        self.series: Dict[LabelKey, list] = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str):
+        key = tuple(sorted(labels.items()))
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, **labels: str) -> int:
+        series = self.series.get(tuple(sorted(labels.items())))
+        return series[2] if series else 0
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            for key, (counts, total, count) in sorted(self.series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    bucket_labels = format_labels(key, 'le="%g"' % bound)
+                    lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+                inf_labels = format_labels(key, 'le="+Inf"')
+                lines.append(f"{self.name}_bucket{inf_labels} {count}")
+                lines.append(f"{self.name}_sum{format_labels(key)} {total:.6f}")
+                lines.append(f"{self.name}_count{format_labels(key)} {count}")
+        return lines
+
+class MetricsRegistry:
+    """Process-wide set of metrics rendered in the Prometheus text exposition format"""
+
+    def __init__(self):
+        self.metrics: Dict[str, object] = {}
+        self.lock = threading.Lock()
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        with self.lock:
+            return self.metrics.setdefault(name, Counter(name, help_text))
+
+    def histogram(self, name: str, help_text: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        with self.lock:
+            return self.metrics.setdefault(name, Histogram(name, help_text, buckets))
+
+    def render(self) -> str:
+        with self.lock:
+            metrics = list(self.metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str):
+        """Write the current metrics to a file atomically (for node_exporter's textfile collector or scraping by hand)"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
+
+METRICS = MetricsRegistry()
+
+STAGE_SECONDS = METRICS.histogram("agent_stage_seconds", "Time spent in each stage of answering a message")
+RESPONSES = METRICS.counter("agent_responses_total", "Answers returned, by where they came from")
+CACHE_LOOKUPS = METRICS.counter("agent_cache_lookups_total", "Response cache lookups, by result")
+LLM_ERRORS = METRICS.counter("agent_llm_errors_total", "Router calls that failed, by kind")
+BREAKER_TRIPS = METRICS.counter("agent_circuit_breaker_trips_total", "Times the router circuit breaker opened")
+DEADLINE_MISSES = METRICS.counter("agent_deadline_misses_total", "Answers served by the fallback because the router missed the deadline")
+LATE_ANSWERS = METRICS.counter("agent_late_answers_cached_total", "Router answers that arrived after the deadline and were cached")
+COALESCED = METRICS.counter("agent_coalesced_requests_total", "Async requests served by an identical in-flight call")
+KB_RELOADS = METRICS.counter("agent_kb_reloads_total", "Times a changed knowledge base was loaded and swapped in")
+WARM_ANSWERS_GENERATED = METRICS.counter("agent_warm_answers_generated_total", "Answers generated ahead of time, by reason")
+REFRESH_RUNS = METRICS.counter("agent_refresh_runs_total", "Background re-crawls of the website, by result")
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    """Record the duration of the enclosed block as one observation of a stage"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - started, stage=stage)
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = METRICS.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+_server: Optional[ThreadingHTTPServer] = None
+_server_lock = threading.Lock()
+
+def start_metrics_server(port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Serve /metrics from a daemon thread; calling it again returns the running server"""
+    global _server
+    with _server_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((host, port), MetricsHandler)
+            threading.Thread(target=_server.serve_forever, daemon=True).start()
+        return _server
+
+def configure_logging(level: str = LOG_LEVEL):
+    """Structured one-line log records; messages below WARNING stay off stdout by default"""
+    logging.basicConfig(
+        level=getattr(logging, level.upper(), logging.WARNING),
+        format="%(asctime)s level=%(levelname)s logger=%(name)s %(message)s"
+    )
@@ -0,0 +1,62 @@
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+class PageCache:
+    """Persistent per-URL cache of HTTP validators, content hashes and extracted page data"""
+
+    def __init__(self, path: str = "page_cache.json"):
+        self.path = path
+        self.lock = threading.Lock()
+        self.entries: Dict[str, Dict] = self.load()
+        self.dirty = False
+
+    def load(self) -> Dict[str, Dict]:
+        """Load cached entries from disk, starting empty if the file is missing or corrupt"""
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (json.JSONDecodeError, OSError) as e:
+            logger.warning("ignoring unreadable page cache %s: %s", self.path, e)
+            return {}
+
+    def get(self, url: str) -> Optional[Dict]:
+        """Return the cached entry for a URL, if any"""
+        with self.lock:
+            return self.entries.get(url)
+
+    def put(self, url: str, entry: Dict):
+        """Store the entry for a URL"""
+        entry["cached_at"] = time.time()
+        with self.lock:
+            self.entries[url] = entry
+            self.dirty = True
+
+    def conditional_headers(self, url: str) -> Dict[str, str]:
+        """Build If-None-Match / If-Modified-Since headers from the cached validators"""
+        entry = self.get(url)
+        headers = {}
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def save(self):
+        """Write the cache to disk atomically if anything changed"""
+        with self.lock:
+            if not self.dirty:
+                return
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(self.entries, f)
+            os.replace(tmp_path, self.path)
+            self.dirty = False
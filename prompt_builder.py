@@ -0,0 +1,111 @@
+import re
+from typing import Dict
+
+from config import CATEGORIES, LLM_CONTEXT_WINDOW, LLM_MAX_TOKENS, PROMPT_CONTEXT_TOKENS
+from intent_router import classify_intent
+
+TOKEN_PIECE = re.compile(r'\w+|[^\w\s]')
+
+# Chat formatting adds a few tokens per message on top of the text itself
+MESSAGE_OVERHEAD_TOKENS = 12
+
+ASSISTANT = "You are a helpful AI assistant for Aryma Labs, a Marketing Mix Modeling company."
+
+# Instructions come first and retrieved content last, so every prompt of one kind shares a stable prefix
+GENERAL_TEMPLATES = {
+    "general:about": f"{ASSISTANT} Please provide natural, conversational responses about Aryma Labs. Be helpful and informative.",
+    "general:contact": f"{ASSISTANT} Please provide information about contacting Aryma Labs and requesting demos. Be helpful and conversational.",
+    "general:founder": (
+        f"{ASSISTANT} IMPORTANT: Only provide information that is explicitly mentioned in the provided content. "
+        "If founder/leadership information is not available in the content, politely state that this information "
+        "is not available in the current data and suggest checking the company website or LinkedIn for the most "
+        "up-to-date information. Please be helpful and conversational."
+    ),
+    "general:products": f"{ASSISTANT} Please provide information about Aryma Labs' products. Be helpful and conversational.",
+    "general": f"{ASSISTANT} Please provide helpful, conversational responses about Aryma Labs.",
+}
+
+def estimate_tokens(text: str) -> int:
+    """Fast local token estimate: one per punctuation mark and one per started four characters of a word
+
+    Errs on the high side for subword tokenizers, so prompts packed to a budget stay within it.
+    """
+    return sum((len(piece) + 3) // 4 for piece in TOKEN_PIECE.findall(text))
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut text after the last whole word that keeps its estimate within max_tokens"""
+    used = 0
+    end = 0
+    for match in TOKEN_PIECE.finditer(text):
+        used += (len(match.group()) + 3) // 4
+        if used > max_tokens:
+            break
+        end = match.end()
+    return text[:end]
+
+class PromptTemplate:
+    """System prompt with its fixed part rendered and measured once"""
+
+    __slots__ = ("name", "prefix", "tokens")
+
+    def __init__(self, name: str, instructions: str):
+        self.name = name
+        self.prefix = f"{instructions}\n\nBased on this information:\n"
+        self.tokens = estimate_tokens(self.prefix)
+
+    def render(self, content: str) -> str:
+        return self.prefix + content
+
+def compile_templates() -> Dict[str, PromptTemplate]:
+    templates = {name: PromptTemplate(name, text) for name, text in GENERAL_TEMPLATES.items()}
+    for category, category_name in CATEGORIES.items():
+        templates[f"category:{category}"] = PromptTemplate(
+            f"category:{category}",
+            f"{ASSISTANT} Please provide helpful, conversational responses about {category_name} from Aryma Labs."
+        )
+    return templates
+
+PROMPT_TEMPLATES = compile_templates()
+
+class PromptAssembler:
+    """Pick the template for a message and fit retrieved content into the model's token budget
+
+    The content budget is what the context window leaves after the reserved answer
+    tokens, the template, the user message and chat overhead, capped at
+    max_context_tokens so prompts stay short when the window is large.
+    """
+
+    def __init__(self, context_window: int = LLM_CONTEXT_WINDOW, max_output_tokens: int = LLM_MAX_TOKENS,
+                 max_context_tokens: int = PROMPT_CONTEXT_TOKENS):
+        self.context_window = context_window
+        self.max_output_tokens = max_output_tokens
+        self.max_context_tokens = max_context_tokens
+
+    def template_for(self, category: str, user_input: str) -> PromptTemplate:
+        if category == "GENERAL":
+            intent = classify_intent(user_input)
+            if intent.sub_intent in ("about", "contact", "founder"):
+                return PROMPT_TEMPLATES[f"general:{intent.sub_intent}"]
+            if intent.category == "MMM_PRODUCTS":
+                return PROMPT_TEMPLATES["general:products"]
+            return PROMPT_TEMPLATES["general"]
+        template = PROMPT_TEMPLATES.get(f"category:{category}")
+        if template is None:
+            template = PROMPT_TEMPLATES[f"category:{category}"] = PromptTemplate(
+                f"category:{category}",
+                f"{ASSISTANT} Please provide helpful, conversational responses about {category} from Aryma Labs."
+            )
+        return template
+
+    def context_budget(self, category: str, user_input: str) -> int:
+        """Tokens of retrieved content that fit in a prompt for this message"""
+        available = (self.context_window - self.max_output_tokens - self.template_for(category, user_input).tokens
+                     - estimate_tokens(user_input) - 2 * MESSAGE_OVERHEAD_TOKENS)
+        return max(0, min(self.max_context_tokens, available))
+
+    def build(self, category: str, user_input: str, content: str) -> str:
+        """Render the system prompt, trimming content that exceeds the budget"""
+        budget = self.context_budget(category, user_input)
+        if estimate_tokens(content) > budget:
+            content = truncate_to_tokens(content, budget)
+        return self.template_for(category, user_input).render(content)
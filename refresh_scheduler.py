@@ -0,0 +1,132 @@
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from typing import Dict, Optional
+
+from config import REFRESH_INTERVAL, REFRESH_JITTER, REFRESH_NICE, REFRESH_PARSE_WORKERS
+from knowledge_base import SharedKnowledgeBase
+from metrics import REFRESH_RUNS
+
+logger = logging.getLogger(__name__)
+
+class RefreshScheduler:
+    """Re-crawl the website on a jittered interval from one background thread and reload the knowledge base
+
+    The crawl runs at lowered priority with few fetch threads and parse processes, so
+    it never blocks a request thread and only uses CPU the chat threads leave idle.
+    """
+
+    def __init__(self, knowledge: SharedKnowledgeBase, interval: float = REFRESH_INTERVAL,
+                 jitter: float = REFRESH_JITTER, parse_workers: int = REFRESH_PARSE_WORKERS, nice: int = REFRESH_NICE):
+        self.knowledge = knowledge
+        self.interval = interval
+        self.jitter = jitter
+        self.parse_workers = parse_workers
+        self.nice = nice
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.state = {
+            "running": False, "last_attempt": None, "last_success": None, "duration": None,
+            "pages": None, "pages_changed": None, "failures": 0, "consecutive_failures": 0,
+            "last_error": None, "next_run": None,
+        }
+        self.thread: Optional[threading.Thread] = None
+
+    def start(self) -> "RefreshScheduler":
+        delay = self.first_delay()
+        with self.lock:
+            self.state["next_run"] = time.time() + delay
+        self.thread = threading.Thread(target=self.run, args=(delay,), name="kb-refresh", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+
+    def status(self) -> Dict:
+        """A copy of the refresh status, safe to read from any thread"""
+        with self.lock:
+            return dict(self.state)
+
+    def next_delay(self) -> float:
+        return self.interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def first_delay(self) -> float:
+        """Continue the schedule from the last crawl on disk, so restarting the app does not re-crawl at once
+
+        refresh_knowledge_base rewrites or touches scraped_content.json after every
+        successful crawl, so its modification time is when the last one finished.
+        """
+        try:
+            age = time.time() - os.path.getmtime(self.knowledge.scraped_data_path)
+        except OSError:
+            return 0.0
+        return max(0.0, self.next_delay() - age)
+
+    def lower_priority(self):
+        # On Linux niceness is per thread and inherited by the crawl's fetch threads
+        if self.nice and sys.platform.startswith("linux"):
+            try:
+                os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), self.nice)
+            except OSError as e:
+                logger.debug("could not lower refresh thread priority: %s", e)
+
+    def run(self, delay: float):
+        self.lower_priority()
+        while True:
+            with self.lock:
+                self.state["next_run"] = time.time() + delay
+            if self.stopped.wait(delay):
+                return
+            self.refresh_once()
+            delay = self.next_delay()
+
+    def refresh_once(self) -> bool:
+        """Crawl, write a new knowledge base version and swap it in; failures keep the current content"""
+        with self.lock:
+            self.state.update(running=True, last_attempt=time.time(), next_run=None)
+        started = time.perf_counter()
+        try:
+            # The scraper and its HTML parsing stack load on the first run, not at app startup
+            from web_scraper import ArymalabsScraper, refresh_knowledge_base
+            scraper = ArymalabsScraper(max_workers=2, parse_workers=self.parse_workers, parse_nice=self.nice)
+            result = refresh_knowledge_base(
+                scraper, self.knowledge.scraped_data_path, self.knowledge.knowledge_store_path,
+                self.knowledge.vector_index_path or "knowledge_vectors", require_pages=True
+            )
+        except Exception as e:
+            REFRESH_RUNS.inc(result="failure")
+            logger.warning("background refresh failed: %s", e)
+            with self.lock:
+                self.state["failures"] += 1
+                self.state["consecutive_failures"] += 1
+                self.state.update(running=False, duration=time.perf_counter() - started,
+                                  last_error=f"{type(e).__name__}: {e}")
+            return False
+        # Load the new files now rather than waiting for the file watcher's next poll
+        self.knowledge.reload()
+        REFRESH_RUNS.inc(result="success")
+        duration = time.perf_counter() - started
+        logger.info("background refresh done pages=%s changed=%s seconds=%.1f",
+                    result.get("total_pages_scraped"), result.get("pages_changed"), duration)
+        with self.lock:
+            self.state.update(running=False, duration=duration, last_success=time.time(), last_error=None,
+                              pages=result.get("total_pages_scraped"), pages_changed=result.get("pages_changed"),
+                              consecutive_failures=0)
+        return True
+
+_scheduler: Optional[RefreshScheduler] = None
+_scheduler_lock = threading.Lock()
+
+def start_refresh_scheduler(knowledge: SharedKnowledgeBase, interval: float = REFRESH_INTERVAL) -> Optional[RefreshScheduler]:
+    """Start the process-wide refresh scheduler once; returns None when refreshing is disabled"""
+    global _scheduler
+    if interval <= 0:
+        return None
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = RefreshScheduler(knowledge, interval).start()
+        return _scheduler
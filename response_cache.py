@@ -0,0 +1,147 @@
+import asyncio
+import concurrent.futures
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from config import RESPONSE_CACHE_PATH, RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL
+
+def normalize_query(text: str) -> str:
+    """Lowercase, collapse whitespace and drop trailing punctuation so trivial variants share a cache entry"""
+    return re.sub(r'\s+', ' ', text.lower()).strip().rstrip('?!.')
+
+def make_key(user_input: str, category: str, prompt: str, kb_version: str, model: str = "") -> str:
+    """Cache key over the normalized question, category, rendered prompt, knowledge-base version and model"""
+    parts = (normalize_query(user_input), category, prompt, kb_version, model)
+    return hashlib.sha256("\x1f".join(parts).encode('utf-8')).hexdigest()
+
+class ResponseCache:
+    """Bounded LRU cache of LLM responses with a TTL and an optional SQLite tier
+
+    The in-memory tier serves repeated questions within a process; the on-disk tier is
+    shared across Streamlit sessions and processes. Keys include the knowledge-base
+    version, so entries for old scraped data are never served and simply age out.
+    """
+
+    def __init__(self, max_entries: int = 512, ttl_seconds: float = 3600, disk_path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.disk = None
+        if disk_path:
+            self.disk = sqlite3.connect(disk_path, check_same_thread=False, timeout=5)
+            with self.disk:
+                self.disk.execute(
+                    "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+                )
+
+    def _remember(self, key: str, value: str, expires_at: float):
+        self.entries[key] = (expires_at, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached response for key if present and not expired"""
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and entry[0] > now:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry:
+                del self.entries[key]
+            if self.disk:
+                row = self.disk.execute(
+                    "SELECT value, expires_at FROM responses WHERE key = ? AND expires_at > ?", (key, now)
+                ).fetchone()
+                if row:
+                    # Promote to memory so the next hit skips SQLite
+                    self._remember(key, row[0], row[1])
+                    self.hits += 1
+                    return row[0]
+            self.misses += 1
+            return None
+
+    def put(self, key: str, value: str):
+        expires_at = time.time() + self.ttl_seconds
+        with self.lock:
+            self._remember(key, value, expires_at)
+            if self.disk:
+                with self.disk:
+                    self.disk.execute(
+                        "INSERT OR REPLACE INTO responses (key, value, expires_at) VALUES (?, ?, ?)",
+                        (key, value, expires_at)
+                    )
+                    self.disk.execute("DELETE FROM responses WHERE expires_at <= ?", (time.time(),))
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            if self.disk:
+                with self.disk:
+                    self.disk.execute("DELETE FROM responses")
+
+class SingleFlight:
+    """Coalesce concurrent async calls with the same key into one upstream call
+
+    The first caller for a key runs the call; callers arriving while it is in flight
+    await the same result instead of issuing a duplicate request. In-flight calls are
+    tracked with thread-safe futures, so callers on different event loops (one per
+    Streamlit session thread) share them too.
+    """
+
+    def __init__(self):
+        self.calls: Dict[str, concurrent.futures.Future] = {}
+        self.lock = threading.Lock()
+        self.coalesced = 0
+
+    async def run(self, key: str, call: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Return (result, shared), where shared is True if another caller's request produced it"""
+        with self.lock:
+            future = self.calls.get(key)
+            leader = future is None
+            if leader:
+                future = self.calls[key] = concurrent.futures.Future()
+            else:
+                self.coalesced += 1
+        if not leader:
+            # Shield so one follower giving up does not cancel the result for the others
+            return await asyncio.shield(asyncio.wrap_future(future)), True
+
+        try:
+            result = await call()
+        except BaseException as e:
+            with self.lock:
+                del self.calls[key]
+            future.set_exception(e if isinstance(e, Exception) else RuntimeError("coalesced request was cancelled"))
+            raise
+        with self.lock:
+            del self.calls[key]
+        future.set_result(result)
+        return result, False
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+def shared_response_cache() -> ResponseCache:
+    """Process-wide cache used by every agent instance unless one is passed explicitly"""
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = ResponseCache(RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL, RESPONSE_CACHE_PATH or None)
+        return _shared_cache
+
+_shared_single_flight = SingleFlight()
+
+def shared_single_flight() -> SingleFlight:
+    """Process-wide in-flight request table used by the agent's async API"""
+    return _shared_single_flight
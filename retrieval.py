@@ -0,0 +1,164 @@
+import math
+import re
+from typing import Callable, Dict, Iterable, List, Optional
+
+from knowledge_store import KnowledgeStore, chunk_text
+
+TOKEN = re.compile(r'\w+')
+
+STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from how i in is it me my of on or our "
+    "tell that the this to we what when where which who why with you your".split()
+)
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens with common stopwords removed"""
+    return [token for token in TOKEN.findall(text.lower()) if token not in STOPWORDS]
+
+class BM25Index:
+    """In-memory inverted index over knowledge-base passages with Okapi BM25 scoring
+
+    Built once when the knowledge base loads; a query only touches the postings of its
+    own terms, so lookups take well under a millisecond for typical question lengths.
+    Passages are dicts with "text" and optional "section", "url" and "categories".
+    """
+
+    def __init__(self, passages: Iterable[Dict], k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.passages: List[Dict] = []
+        self.postings: Dict[str, List[tuple]] = {}
+        self.lengths: List[int] = []
+        for passage in passages:
+            self.add(passage)
+        self.finalize()
+
+    def add(self, passage: Dict):
+        doc_id = len(self.passages)
+        tokens = tokenize(f"{passage.get('section', '')} {passage['text']}")
+        counts: Dict[str, int] = {}
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+        for token, count in counts.items():
+            self.postings.setdefault(token, []).append((doc_id, count))
+        self.passages.append(passage)
+        self.lengths.append(len(tokens))
+
+    def finalize(self):
+        """Precompute IDF and length normalization so queries only add up weights"""
+        count = len(self.passages)
+        average = sum(self.lengths) / count if count else 0.0
+        self.idf = {
+            term: math.log(1 + (count - len(docs) + 0.5) / (len(docs) + 0.5))
+            for term, docs in self.postings.items()
+        }
+        self.norms = [
+            self.k1 * (1 - self.b + self.b * length / average) if average else self.k1
+            for length in self.lengths
+        ]
+
+    def __len__(self) -> int:
+        return len(self.passages)
+
+    def search(self, query: str, k: int = 5, category: Optional[str] = None) -> List[Dict]:
+        """Return up to k passages ranked by BM25, optionally restricted to one category"""
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for doc_id, tf in self.postings[term]:
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + self.norms[doc_id])
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        results = []
+        for doc_id, score in ranked:
+            passage = self.passages[doc_id]
+            if category and category not in passage.get("categories", ()):
+                continue
+            results.append(dict(passage, score=score))
+            if len(results) >= k:
+                break
+        return results
+
+    def category_passages(self, category: str, k: int = 5) -> List[Dict]:
+        """Return the first k passages tagged with a category, in knowledge-base order"""
+        return [passage for passage in self.passages if category in passage.get("categories", ())][:k]
+
+class StoreRetriever:
+    """BM25 ranking done by the chunk store's FTS5 index, with the same interface as BM25Index
+
+    Nothing is loaded up front: each query reads only the chunks it returns, so memory
+    and load time stay flat however many pages are crawled.
+    """
+
+    def __init__(self, store: KnowledgeStore):
+        self.store = store
+
+    def __len__(self) -> int:
+        return self.store.chunk_count()
+
+    def search(self, query: str, k: int = 5, category: Optional[str] = None) -> List[Dict]:
+        """Return up to k chunks ranked by FTS5 bm25(), optionally restricted to one category"""
+        # Same stopword handling as BM25Index, so "what is MMM" matches on "mmm" alone
+        terms = tokenize(query)
+        if not terms:
+            return []
+        return self.store.search(' '.join(terms), category, k)
+
+    def category_passages(self, category: str, k: int = 5) -> List[Dict]:
+        """Return the first k chunks tagged with a category, in crawl order"""
+        return self.store.chunks_for_category(category, k)
+
+def reciprocal_rank_fusion(rankings: List[List[Dict]], k: int = 5, constant: int = 60) -> List[Dict]:
+    """Merge several ranked passage lists, rewarding passages ranked highly by any of them"""
+    scores: Dict[int, float] = {}
+    passages: Dict[int, Dict] = {}
+    for ranking in rankings:
+        for rank, passage in enumerate(ranking):
+            key = passage.get("id", id(passage["text"]))
+            scores[key] = scores.get(key, 0.0) + 1.0 / (constant + rank + 1)
+            passages.setdefault(key, passage)
+    ranked = sorted(scores, key=scores.get, reverse=True)[:k]
+    return [dict(passages[key], score=scores[key]) for key in ranked]
+
+def pack_passages(passages: List[Dict], budget: int, separator: str = "\n\n", cost: Callable[[str], int] = len,
+                  truncate: Optional[Callable[[str, int], str]] = None) -> str:
+    """Join the best passages that fit within budget, skipping any that would overflow
+
+    The budget is in characters unless another cost function (such as a token estimate)
+    is given, in which case truncate should cut text to that many cost units.
+    """
+    selected = []
+    used = 0
+    separator_cost = cost(separator)
+    for passage in passages:
+        text = f"{passage['section']}: {passage['text']}" if passage.get("section") else passage["text"]
+        text_cost = cost(text) + (separator_cost if selected else 0)
+        if used + text_cost > budget:
+            continue
+        selected.append(text)
+        used += text_cost
+    if not selected and passages:
+        # Even the best passage is over budget; keep its leading part rather than nothing
+        first = passages[0]
+        text = f"{first['section']}: {first['text']}" if first.get("section") else first["text"]
+        return truncate(text, budget) if truncate else text[:budget]
+    return separator.join(selected)
+
+def passages_from_scraped_data(scraped_data: Dict, max_chars: int = 800) -> List[Dict]:
+    """Build passages from a scraped_content.json payload (used when no chunk store exists)"""
+    passages = []
+    sections = scraped_data.get("sections")
+    if isinstance(sections, list) and sections:
+        for section in sections:
+            for chunk in chunk_text(section["text"], max_chars):
+                passages.append({"text": chunk, "section": " > ".join(section["heading_path"]), "url": section["url"]})
+    else:
+        for chunk in chunk_text(scraped_data.get("main_content", ""), max_chars):
+            passages.append({"text": chunk})
+    for category, sentences in scraped_data.get("categorized_content", {}).items():
+        if not isinstance(sentences, list):
+            sentences = [str(sentences)]
+        for sentence in sentences:
+            passages.append({"text": sentence, "categories": (category,)})
+    return passages
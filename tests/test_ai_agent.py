@@ -0,0 +1,85 @@
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ai_agent import ArymalabsAgent  # noqa: E402
+from keyword_matcher import KeywordMatcher  # noqa: E402
+from knowledge_base import SharedKnowledgeBase  # noqa: E402
+from knowledge_store import staged_store, store_scraped_content  # noqa: E402
+from response_cache import ResponseCache  # noqa: E402
+from warm_answers import WarmAnswers  # noqa: E402
+
+ANSWER = "Aryma Labs builds marketing mix models for enterprise marketers."
+QUESTION = "What MMM services do you offer?"
+
+class SlowRouter:
+    """Stands in for LLMClient, answering after delay seconds"""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.calls = 0
+
+    def chat(self, messages, model, **kwargs):
+        self.calls += 1
+        time.sleep(self.delay)
+        return ANSWER
+
+    def chat_stream(self, messages, model, **kwargs):
+        self.calls += 1
+        time.sleep(self.delay)
+        for word in ANSWER.split(" "):
+            yield word + " "
+
+@pytest.fixture
+def knowledge(tmp_path):
+    db = str(tmp_path / "knowledge.db")
+    text = "Marketing mix modeling services for enterprise brands."
+    with staged_store(db) as store:
+        store_scraped_content({"main_content": text, "pages": [{"url": "https://example.com/", "text": text}]},
+                              store, KeywordMatcher({"MMM_SERVICES": ["modeling"]}))
+    return SharedKnowledgeBase(str(tmp_path / "missing.json"), db, reload_interval=0)
+
+def make_agent(knowledge, router, deadline):
+    agent = ArymalabsAgent(knowledge=knowledge, llm_client=router, deadline=deadline,
+                           response_cache=ResponseCache(), warm_answers=WarmAnswers(path=None))
+    agent.hf_api_key = "test"
+    return agent
+
+def wait_for(condition, timeout: float = 5.0):
+    stop = time.monotonic() + timeout
+    while not condition() and time.monotonic() < stop:
+        time.sleep(0.02)
+    return condition()
+
+def test_router_within_the_deadline_answers(knowledge):
+    agent = make_agent(knowledge, SlowRouter(0.0), deadline=2.0)
+    assert agent.generate_response(QUESTION, "content", "MMM_SERVICES") == ANSWER
+    assert agent.last_response_source == "llm"
+
+def test_missed_deadline_falls_back_and_caches_the_late_answer(knowledge):
+    router = SlowRouter(0.3)
+    agent = make_agent(knowledge, router, deadline=0.05)
+    started = time.monotonic()
+    agent.generate_response(QUESTION, "content", "MMM_SERVICES")
+    assert agent.last_response_source == "fallback"
+    assert time.monotonic() - started < 0.25, "the fallback must not wait for the router"
+
+    cache_key, _ = agent.prepare(QUESTION, "content", "MMM_SERVICES")
+    assert wait_for(lambda: agent.response_cache.get(cache_key) is not None)
+    assert agent.generate_response(QUESTION, "content", "MMM_SERVICES") == ANSWER
+    assert agent.last_response_source == "cache"
+    assert router.calls == 1
+
+def test_stream_without_a_first_token_by_the_deadline_falls_back(knowledge):
+    agent = make_agent(knowledge, SlowRouter(0.3), deadline=0.05)
+    reply = "".join(agent.generate_response_stream(QUESTION, "content", "MMM_SERVICES"))
+    assert agent.last_response_source == "fallback"
+    assert reply
+
+    cache_key, _ = agent.prepare(QUESTION, "content", "MMM_SERVICES")
+    assert wait_for(lambda: agent.response_cache.get(cache_key) is not None)
+    assert agent.response_cache.get(cache_key).strip() == ANSWER
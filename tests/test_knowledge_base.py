@@ -0,0 +1,78 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from keyword_matcher import KeywordMatcher  # noqa: E402
+from knowledge_base import KnowledgeBase, SharedKnowledgeBase  # noqa: E402
+from knowledge_store import staged_store, store_scraped_content  # noqa: E402
+
+MATCHER = KeywordMatcher({"MMM_SERVICES": ["modeling"]})
+
+def crawl_result(text: str):
+    return {
+        "main_content": text,
+        "pages": [{"url": "https://example.com/", "text": text}],
+        "sections": [{"url": "https://example.com/", "heading_path": ["Home"], "text": text}],
+    }
+
+def write_store(path: str, text: str):
+    with staged_store(path) as store:
+        store_scraped_content(crawl_result(text), store, MATCHER)
+
+def test_loaded_knowledge_base_keeps_its_version_after_the_store_is_rewritten(tmp_path):
+    db = str(tmp_path / "knowledge.db")
+    write_store(db, "Alpha marketing mix modeling consulting.")
+    old = KnowledgeBase(str(tmp_path / "missing.json"), db)
+    old_version = old.version
+
+    write_store(db, "Beta experimentation platform for incrementality tests.")
+    assert old.version == old_version
+    assert [chunk["text"] for chunk in old.retriever.search("alpha")] == ["Alpha marketing mix modeling consulting."]
+    assert old.retriever.search("beta") == []
+
+    new = KnowledgeBase(str(tmp_path / "missing.json"), db)
+    assert new.version != old_version
+    assert new.retriever.search("alpha") == []
+    assert len(new.retriever.search("beta")) == 1
+
+def test_failed_update_leaves_the_store_untouched(tmp_path):
+    db = str(tmp_path / "knowledge.db")
+    write_store(db, "Alpha marketing mix modeling consulting.")
+    version = KnowledgeBase(str(tmp_path / "missing.json"), db).version
+    try:
+        with staged_store(db) as store:
+            store_scraped_content(crawl_result("Half written."), store, MATCHER)
+            raise RuntimeError("crawl failed")
+    except RuntimeError:
+        pass
+    assert KnowledgeBase(str(tmp_path / "missing.json"), db).version == version
+    assert not os.path.exists(f"{db}.tmp")
+
+def test_reload_swaps_in_a_new_version_and_notifies_listeners(tmp_path):
+    db = str(tmp_path / "knowledge.db")
+    write_store(db, "Alpha marketing mix modeling consulting.")
+    shared = SharedKnowledgeBase(str(tmp_path / "missing.json"), db, reload_interval=0)
+    first = shared.current
+    reloaded = []
+    shared.on_reload(reloaded.append)
+
+    assert not shared.reload(), "unchanged content is not swapped"
+    assert shared.current is first
+
+    write_store(db, "Beta experimentation platform for incrementality tests.")
+    assert shared.reload()
+    assert reloaded == [shared.current]
+    assert shared.current.version != first.version
+    assert first.retriever.search("alpha"), "sessions holding the old version still read it whole"
+
+def test_pages_gone_from_the_crawl_count_as_changes(tmp_path):
+    db = str(tmp_path / "knowledge.db")
+    two_pages = crawl_result("Alpha marketing mix modeling consulting.")
+    two_pages["pages"].append({"url": "https://example.com/old", "text": "Retired product page."})
+    two_pages["sections"].append({"url": "https://example.com/old", "heading_path": ["Old"], "text": "Retired product page."})
+    with staged_store(db) as store:
+        assert store_scraped_content(two_pages, store, MATCHER) == 2
+    with staged_store(db) as store:
+        assert store_scraped_content(crawl_result("Alpha marketing mix modeling consulting."), store, MATCHER) == 1
+        assert store.chunk_count() == 1
@@ -0,0 +1,60 @@
+import asyncio
+import os
+import socket
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm_client import AsyncLLMClient, CircuitBreaker  # noqa: E402
+
+@pytest.fixture
+def silent_server():
+    """A socket that accepts connections and never answers, like a hung router"""
+    server = socket.socket()
+    server.bind(("127.0.0.1", 0))
+    server.listen(16)
+    yield f"http://127.0.0.1:{server.getsockname()[1]}/"
+    server.close()
+
+def open_breaker(reset_timeout: float = 0.05) -> CircuitBreaker:
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=reset_timeout)
+    breaker.record_failure()
+    return breaker
+
+def test_breaker_lets_one_trial_through_when_half_open():
+    breaker = open_breaker()
+    assert breaker.state == "open" and not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+    assert not breaker.allow(), "only one trial at a time"
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow()
+
+def test_failed_trial_opens_the_breaker_again():
+    breaker = open_breaker()
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+
+def test_cancelled_half_open_trial_is_released(silent_server):
+    breaker = open_breaker()
+    time.sleep(0.06)
+
+    async def cancel_trial():
+        client = AsyncLLMClient(api_url=silent_server, api_key="test", read_timeout=30, breaker=breaker)
+        task = asyncio.create_task(client.chat([{"role": "user", "content": "hi"}], "model"))
+        await asyncio.sleep(0.1)
+        assert breaker.trial_in_flight
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        await client.aclose()
+
+    asyncio.run(cancel_trial())
+    assert not breaker.trial_in_flight
+    assert breaker.allow(), "a cancelled trial must not block the breaker for good"
@@ -0,0 +1,83 @@
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import web_scraper  # noqa: E402
+from refresh_scheduler import RefreshScheduler, start_refresh_scheduler  # noqa: E402
+
+class FakeKnowledge:
+    def __init__(self, scraped_data_path: str):
+        self.scraped_data_path = scraped_data_path
+        self.knowledge_store_path = scraped_data_path + ".db"
+        self.vector_index_path = None
+        self.reloads = 0
+
+    def reload(self):
+        self.reloads += 1
+        return True
+
+@pytest.fixture
+def crawl(monkeypatch):
+    """Replaces the real crawl; set crawl.error to make it fail"""
+    class Crawl:
+        error = None
+        runs = 0
+
+    def refresh_knowledge_base(scraper, *args, **kwargs):
+        Crawl.runs += 1
+        if Crawl.error:
+            raise Crawl.error
+        return {"total_pages_scraped": 12, "pages_changed": 3}
+
+    monkeypatch.setattr(web_scraper, "ArymalabsScraper", lambda **kwargs: None)
+    monkeypatch.setattr(web_scraper, "refresh_knowledge_base", refresh_knowledge_base)
+    return Crawl
+
+def test_successful_refresh_reloads_and_records_status(tmp_path, crawl):
+    knowledge = FakeKnowledge(str(tmp_path / "scraped_content.json"))
+    scheduler = RefreshScheduler(knowledge, interval=3600, nice=0)
+    assert scheduler.refresh_once()
+    status = scheduler.status()
+    assert knowledge.reloads == 1
+    assert status["pages"] == 12 and status["pages_changed"] == 3
+    assert status["last_success"] and not status["running"] and status["consecutive_failures"] == 0
+
+def test_failed_refresh_keeps_content_and_counts_failures(tmp_path, crawl):
+    knowledge = FakeKnowledge(str(tmp_path / "scraped_content.json"))
+    scheduler = RefreshScheduler(knowledge, interval=3600, nice=0)
+    crawl.error = RuntimeError("site unreachable")
+    assert not scheduler.refresh_once()
+    assert not scheduler.refresh_once()
+    status = scheduler.status()
+    assert knowledge.reloads == 0
+    assert status["failures"] == 2 and status["consecutive_failures"] == 2
+    assert status["last_error"] == "RuntimeError: site unreachable" and not status["running"]
+
+    crawl.error = None
+    assert scheduler.refresh_once()
+    assert scheduler.status()["consecutive_failures"] == 0
+
+def test_first_run_continues_the_schedule_from_the_last_crawl(tmp_path):
+    path = tmp_path / "scraped_content.json"
+    scheduler = RefreshScheduler(FakeKnowledge(str(path)), interval=3600, jitter=0)
+    assert scheduler.first_delay() == 0.0, "never crawled: crawl now"
+    path.write_text("{}")
+    assert scheduler.first_delay() == pytest.approx(3600, abs=5)
+    os.utime(path, (time.time() - 7200, time.time() - 7200))
+    assert scheduler.first_delay() == 0.0, "overdue: crawl now"
+
+def test_scheduler_runs_on_its_interval_until_stopped(tmp_path, crawl):
+    scheduler = RefreshScheduler(FakeKnowledge(str(tmp_path / "missing.json")), interval=0.05, jitter=0, nice=0)
+    scheduler.start()
+    time.sleep(0.3)
+    scheduler.stop()
+    scheduler.thread.join(timeout=2)
+    assert not scheduler.thread.is_alive()
+    assert crawl.runs >= 2
+
+def test_refresh_disabled_with_zero_interval(tmp_path):
+    assert start_refresh_scheduler(FakeKnowledge(str(tmp_path / "missing.json")), interval=0) is None
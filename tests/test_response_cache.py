@@ -0,0 +1,83 @@
+import asyncio
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from response_cache import SingleFlight  # noqa: E402
+
+def test_concurrent_calls_with_one_key_share_one_request():
+    flight = SingleFlight()
+    calls = []
+
+    async def call():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "answer"
+
+    async def main():
+        return await asyncio.gather(*(flight.run("key", call) for _ in range(5)))
+
+    results = asyncio.run(main())
+    assert len(calls) == 1
+    assert sorted(shared for _, shared in results) == [False, True, True, True, True]
+    assert {result for result, _ in results} == {"answer"}
+    assert flight.calls == {}
+
+def test_failure_reaches_every_waiter_and_the_next_call_retries():
+    flight = SingleFlight()
+
+    async def failing():
+        await asyncio.sleep(0.05)
+        raise ValueError("router down")
+
+    async def main():
+        return await asyncio.gather(*(flight.run("key", failing) for _ in range(3)), return_exceptions=True)
+
+    assert all(isinstance(result, ValueError) for result in asyncio.run(main()))
+
+    async def succeeding():
+        return "answer"
+
+    assert asyncio.run(flight.run("key", succeeding)) == ("answer", False)
+
+def test_follower_giving_up_does_not_cancel_the_leader():
+    flight = SingleFlight()
+
+    async def call():
+        await asyncio.sleep(0.1)
+        return "answer"
+
+    async def main():
+        leader = asyncio.create_task(flight.run("key", call))
+        await asyncio.sleep(0.01)
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(flight.run("key", call), timeout=0.02)
+        return await leader
+
+    assert asyncio.run(main()) == ("answer", False)
+
+def test_callers_on_different_event_loops_share_the_request():
+    flight = SingleFlight()
+    calls = []
+
+    async def call():
+        calls.append(1)
+        await asyncio.sleep(0.1)
+        return "answer"
+
+    results = []
+
+    def session():
+        results.append(asyncio.run(flight.run("key", call)))
+
+    threads = [threading.Thread(target=session) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=5)
+    assert len(calls) == 1
+    assert sorted(shared for _, shared in results) == [False, True, True]
@@ -0,0 +1,58 @@
+import hashlib
+import multiprocessing
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import web_scraper  # noqa: E402
+from web_scraper import ArymalabsScraper, _init_parse_worker  # noqa: E402
+
+CRASH_URL = "https://example.com/page/7"
+
+def crashing_parse(url, content):
+    # Stands in for a parse worker killed by the OOM killer
+    if url == CRASH_URL:
+        os._exit(1)
+    return web_scraper._worker_scraper.timed_parse({"url": url, "content": content})
+
+class OfflineScraper(ArymalabsScraper):
+    """Serves generated pages instead of fetching them"""
+
+    def fetch_raw(self, url):
+        content = f"<html><body><h1>{url}</h1><p>Marketing mix modeling page {url}.</p></body></html>".encode()
+        return {"url": url, "content": content, "content_hash": hashlib.sha256(content).hexdigest(),
+                "etag": None, "last_modified": None}
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork to patch the worker function")
+def test_fetch_pages_survives_dead_parse_worker(monkeypatch):
+    monkeypatch.setattr(web_scraper, "_parse_in_worker", crashing_parse)
+    scraper = OfflineScraper("https://example.com", parse_workers=2, parse_queue_size=4)
+    scraper._parse_pool = ProcessPoolExecutor(
+        max_workers=2, mp_context=multiprocessing.get_context("fork"),
+        initializer=_init_parse_worker, initargs=(scraper.base_url, scraper.parser)
+    )
+    urls = [f"https://example.com/page/{i}" for i in range(200)]
+    results = []
+    crawl = threading.Thread(target=lambda: results.append(scraper.fetch_pages(urls)), daemon=True)
+    crawl.start()
+    crawl.join(timeout=60)
+    assert not crawl.is_alive(), "fetch_pages hung after a parse worker died"
+    assert [record["url"] for record in results[0]] == urls
+    # The broken pool is dropped so the next crawl starts a fresh one
+    assert scraper._parse_pool is None
+
+def test_extract_sections_skips_non_text_nodes():
+    html = ("<!DOCTYPE html><?php echo 'x'; ?><html><body><!-- nav comment -->"
+            "<p>Intro text</p><h1>Services</h1><p>Marketing mix modeling.</p></body></html>")
+    scraper = ArymalabsScraper("https://example.com", parse_workers=0)
+    sections = scraper.extract_sections(BeautifulSoup(html, "html.parser"))
+    assert sections == [
+        {"heading_path": [], "blocks": ["Intro text"]},
+        {"heading_path": ["Services"], "blocks": ["Services", "Marketing mix modeling."]},
+    ]
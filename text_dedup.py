@@ -0,0 +1,119 @@
+import math
+import re
+import sys
+from array import array
+from typing import Dict, List, Tuple
+
+SIMHASH_BITS = 64
+# With 4 bands of 16 bits, any two fingerprints within 3 bits share at least one band
+BANDS = 4
+BAND_BITS = SIMHASH_BITS // BANDS
+SHINGLE_SIZE = 4
+MIN_SIMHASH_LENGTH = 16
+HASH_MASK = (1 << SIMHASH_BITS) - 1
+
+def normalize_block(block: str) -> str:
+    """Lowercase and collapse whitespace so trivially different copies compare equal"""
+    return re.sub(r'\s+', ' ', block.lower()).strip()
+
+def simhash(text: str, shingle_size: int = SHINGLE_SIZE) -> int:
+    """64-bit SimHash over character shingles; near-identical texts differ in only a few bits
+
+    Uses the built-in string hash, so fingerprints are only comparable within one process.
+    """
+    shingles = {text[i:i + shingle_size] for i in range(max(1, len(text) - shingle_size + 1))}
+    hashes = array('Q', (hash(shingle) & HASH_MASK for shingle in shingles))
+    threshold = len(hashes) / 2
+
+    # Pack all hashes into one big integer (one 64-bit lane each) and count each bit
+    # across lanes with a single AND + popcount, so the per-shingle work stays in C
+    packed = int.from_bytes(hashes.tobytes(), sys.byteorder)
+    lane_ones = int.from_bytes((1).to_bytes(8, sys.byteorder) * len(hashes), sys.byteorder)
+    fingerprint = 0
+    for bit in range(SIMHASH_BITS):
+        if (packed & (lane_ones << bit)).bit_count() > threshold:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+class BoilerplateFilter:
+    """Detects text blocks repeated across pages (exactly or nearly) and keeps each one only once
+
+    Short blocks (menu items, buttons) are matched exactly. Longer blocks are matched by
+    SimHash within max_distance bits, using band tables so lookups stay O(1) on average.
+    A repeated block stays in the first page it appears on; only blocks found on at least
+    min_pages pages and min_share of all pages (navigation, footers) count as boilerplate
+    and are removed from every page.
+    """
+
+    def __init__(self, max_distance: int = 3, min_pages: int = 3, min_share: float = 0.5):
+        self.max_distance = max_distance
+        self.min_pages = min_pages
+        self.min_share = min_share
+        self.exact: Dict[str, int] = {}
+        self.bands: List[Dict[int, List[Tuple[int, int]]]] = [{} for _ in range(BANDS)]
+        self.cluster_count = 0
+
+    def _new_cluster(self) -> int:
+        self.cluster_count += 1
+        return self.cluster_count - 1
+
+    def cluster_of(self, block: str) -> int:
+        """Return a cluster id shared by all exact or near duplicates of block"""
+        normalized = normalize_block(block)
+        cluster = self.exact.get(normalized)
+        if cluster is not None:
+            return cluster
+        if len(normalized) < MIN_SIMHASH_LENGTH:
+            cluster = self.exact[normalized] = self._new_cluster()
+            return cluster
+
+        fingerprint = simhash(normalized)
+        band_keys = [(fingerprint >> (band * BAND_BITS)) & ((1 << BAND_BITS) - 1) for band in range(BANDS)]
+        for band, key in enumerate(band_keys):
+            for candidate, cluster in self.bands[band].get(key, ()):
+                if bin(candidate ^ fingerprint).count('1') <= self.max_distance:
+                    self.exact[normalized] = cluster
+                    return cluster
+
+        cluster = self.exact[normalized] = self._new_cluster()
+        for band, key in enumerate(band_keys):
+            self.bands[band].setdefault(key, []).append((fingerprint, cluster))
+        return cluster
+
+    def split(self, pages: List[List[str]]) -> Tuple[List[List[str]], List[str]]:
+        """Split each page's blocks into unique content and shared boilerplate
+
+        Returns the per-page blocks with boilerplate and later repeats removed, plus the
+        boilerplate blocks themselves, each kept once in first-seen order.
+        """
+        masks, boilerplate = self.keep_mask(pages)
+        unique_pages = [
+            [block for block, keep in zip(blocks, mask) if keep]
+            for blocks, mask in zip(pages, masks)
+        ]
+        return unique_pages, boilerplate
+
+    def keep_mask(self, pages: List[List[str]]) -> Tuple[List[List[bool]], List[str]]:
+        """Like split, but return a keep flag per block so callers can preserve their own structure"""
+        page_clusters = [[self.cluster_of(block) for block in blocks] for blocks in pages]
+
+        pages_per_cluster: Dict[int, int] = {}
+        for clusters in page_clusters:
+            for cluster in set(clusters):
+                pages_per_cluster[cluster] = pages_per_cluster.get(cluster, 0) + 1
+
+        threshold = max(self.min_pages, math.ceil(self.min_share * len(pages)))
+        emitted = set()
+        boilerplate = []
+        masks = []
+        for blocks, clusters in zip(pages, page_clusters):
+            mask = []
+            for block, cluster in zip(blocks, clusters):
+                first = cluster not in emitted
+                emitted.add(cluster)
+                shared = pages_per_cluster[cluster] >= threshold
+                if first and shared:
+                    boilerplate.append(block)
+                mask.append(first and not shared)
+            masks.append(mask)
+        return masks, boilerplate
@@ -0,0 +1,261 @@
+import copy
+import logging
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Set, Tuple
+
+from config import CATEGORIES, QUICK_ACTIONS, WARM_ANSWER_TTL, WARM_ANSWERS_PATH, WARM_TOP_QUERIES
+from metrics import WARM_ANSWERS_GENERATED
+from response_cache import normalize_query
+
+if TYPE_CHECKING:
+    from ai_agent import ArymalabsAgent
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS answers (
+    key TEXT PRIMARY KEY,
+    question TEXT NOT NULL,
+    answer TEXT NOT NULL,
+    kb_version TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS queries (
+    normalized TEXT PRIMARY KEY,
+    text TEXT NOT NULL,
+    count INTEGER NOT NULL
+);
+"""
+
+class WarmAnswers:
+    """Answers generated ahead of time for quick actions and the most asked questions
+
+    Entries use the response cache's key (question, category, prompt, knowledge-base
+    version, model), so they only match the content they were generated from. They do
+    not expire: an entry older than ttl_seconds is still served and regenerated in the
+    background, so a warm question never waits on the router.
+    """
+
+    def __init__(self, path: Optional[str] = WARM_ANSWERS_PATH, ttl_seconds: float = WARM_ANSWER_TTL,
+                 top_queries: int = WARM_TOP_QUERIES, flush_every: int = 20, max_queries: int = 10000):
+        self.ttl_seconds = ttl_seconds
+        self.top_queries = top_queries
+        self.flush_every = flush_every
+        # Distinct questions counted; the rarest are forgotten beyond this
+        self.max_queries = max_queries
+        self.lock = threading.Lock()
+        # key -> (answer, kb_version, created_at, question)
+        self.entries: Dict[str, Tuple[str, str, float, str]] = {}
+        # Query counts not yet flushed, and (without a disk tier) all counts: normalized -> [text, count]
+        self.pending_queries: Dict[str, list] = {}
+        self.query_counts: Dict[str, list] = {}
+        self.revalidating: Set[str] = set()
+        # One background router call at a time, so revalidation never competes with chats for the API
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="warm-answers")
+        self.warming = threading.Lock()
+        self.rerun = False
+        self.disk = None
+        if path:
+            self.disk = sqlite3.connect(path, check_same_thread=False, timeout=5)
+            with self.disk:
+                self.disk.executescript(SCHEMA)
+            for key, question, answer, kb_version, created_at in self.disk.execute(
+                    "SELECT key, question, answer, kb_version, created_at FROM answers"):
+                self.entries[key] = (answer, kb_version, created_at, question)
+
+    def get(self, key: str) -> Optional[Tuple[str, bool]]:
+        """Return (answer, stale) for a warm key, or None"""
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        return entry[0], time.time() - entry[2] > self.ttl_seconds
+
+    def fresh(self, key: str) -> bool:
+        found = self.get(key)
+        return found is not None and not found[1]
+
+    def put(self, key: str, question: str, answer: str, kb_version: str):
+        created_at = time.time()
+        with self.lock:
+            self.entries[key] = (answer, kb_version, created_at, question)
+            if self.disk:
+                with self.disk:
+                    self.disk.execute(
+                        "INSERT OR REPLACE INTO answers (key, question, answer, kb_version, created_at) VALUES (?, ?, ?, ?, ?)",
+                        (key, question, answer, kb_version, created_at)
+                    )
+
+    def prune(self, kb_version: str):
+        """Drop answers generated from older knowledge-base versions"""
+        with self.lock:
+            self.entries = {key: entry for key, entry in self.entries.items() if entry[1] == kb_version}
+            if self.disk:
+                with self.disk:
+                    self.disk.execute("DELETE FROM answers WHERE kb_version != ?", (kb_version,))
+
+    def revalidate(self, key: str, question: str, kb_version: str, call: Callable[[], str]):
+        """Regenerate a stale answer in the background; the stale one keeps being served meanwhile"""
+        with self.lock:
+            if key in self.revalidating:
+                return
+            self.revalidating.add(key)
+
+        def run():
+            try:
+                answer = call()
+                if answer and len(answer) > 20:
+                    self.put(key, question, answer, kb_version)
+                    WARM_ANSWERS_GENERATED.inc(reason="revalidate")
+            except Exception as e:
+                logger.info("warm answer revalidation failed: %s", e)
+            finally:
+                with self.lock:
+                    self.revalidating.discard(key)
+
+        self.executor.submit(run)
+
+    def record_query(self, text: str):
+        """Count a user question towards the most frequent queries"""
+        normalized = normalize_query(text)
+        if not normalized:
+            return
+        with self.lock:
+            entry = self.pending_queries.setdefault(normalized, [text, 0])
+            entry[1] += 1
+            pending = sum(count for _, count in self.pending_queries.values())
+        if pending >= self.flush_every:
+            self.flush_queries()
+
+    def flush_queries(self):
+        with self.lock:
+            pending, self.pending_queries = self.pending_queries, {}
+            if not pending:
+                return
+            if self.disk:
+                with self.disk:
+                    self.disk.executemany(
+                        "INSERT INTO queries (normalized, text, count) VALUES (?, ?, ?) "
+                        "ON CONFLICT(normalized) DO UPDATE SET count = count + excluded.count",
+                        [(normalized, text, count) for normalized, (text, count) in pending.items()]
+                    )
+                    self.disk.execute(
+                        "DELETE FROM queries WHERE normalized NOT IN "
+                        "(SELECT normalized FROM queries ORDER BY count DESC LIMIT ?)", (self.max_queries,)
+                    )
+                return
+            for normalized, (text, count) in pending.items():
+                entry = self.query_counts.setdefault(normalized, [text, 0])
+                entry[1] += count
+            if len(self.query_counts) > self.max_queries:
+                ranked = sorted(self.query_counts.items(), key=lambda item: item[1][1], reverse=True)
+                self.query_counts = dict(ranked[:self.max_queries])
+
+    def frequent_queries(self, limit: int) -> List[str]:
+        """The most asked questions, in their first-seen wording"""
+        self.flush_queries()
+        if self.disk:
+            with self.lock:
+                rows = self.disk.execute("SELECT text FROM queries ORDER BY count DESC LIMIT ?", (limit,)).fetchall()
+            return [row[0] for row in rows]
+        with self.lock:
+            ranked = sorted(self.query_counts.values(), key=lambda entry: entry[1], reverse=True)
+        return [text for text, _ in ranked[:limit]]
+
+    def questions(self) -> List[str]:
+        """Quick actions first, then the most frequent queries, without duplicates"""
+        questions = {normalize_query(question): question for question in QUICK_ACTIONS.values()}
+        # Clicked quick actions are counted too; look past them so top_queries real questions are kept warm
+        frequent = [question for question in self.frequent_queries(self.top_queries + len(questions))
+                    if normalize_query(question) not in questions]
+        for question in frequent[:self.top_queries]:
+            questions[normalize_query(question)] = question
+        return list(questions.values())
+
+    def warm_up(self, agent: "ArymalabsAgent") -> int:
+        """Generate answers for every warm question in each conversation state; returns how many were generated
+
+        A question's prompt depends on the conversation's category, so each is prepared as
+        a first message and as a follow-up in every category. States that lead to the same
+        prompt share one answer, and answers already fresh for this knowledge base are kept.
+        """
+        if not agent.hf_api_key:
+            return 0
+        from llm_client import LLMError
+        session = copy.copy(agent)
+        kb_version = agent.kb_version
+        generated = 0
+        seen = set()
+        for question in self.questions():
+            for category in [None] + list(CATEGORIES):
+                session.reset_conversation()
+                session.user_category = category
+                context = session.user_response_context if category is None else session.follow_up_context
+                relevant_content, selected = context(question)
+                cache_key, messages = session.prepare(question, relevant_content, selected)
+                if cache_key in seen or self.fresh(cache_key):
+                    continue
+                seen.add(cache_key)
+                try:
+                    answer = session.ask_router(messages)
+                except LLMError as e:
+                    # Router unavailable: keep what is warm and try again after the next refresh
+                    logger.warning("warm-up stopped after %d answers: %s", generated, e)
+                    return generated
+                if answer and len(answer) > 20:
+                    self.put(cache_key, question, answer, kb_version)
+                    WARM_ANSWERS_GENERATED.inc(reason="warm_up")
+                    generated += 1
+        self.prune(kb_version)
+        logger.info("warm-up done generated=%d warm=%d", generated, len(self.entries))
+        return generated
+
+    def schedule_warm_up(self, agent: "ArymalabsAgent"):
+        """Run warm_up on a background thread; a request during a run starts one more run after it"""
+        if not self.warming.acquire(blocking=False):
+            self.rerun = True
+            return
+
+        def run():
+            try:
+                while True:
+                    self.rerun = False
+                    try:
+                        self.warm_up(agent)
+                    except Exception:
+                        logger.exception("warm-up failed")
+                    if not self.rerun:
+                        return
+            finally:
+                self.warming.release()
+
+        threading.Thread(target=run, name="warm-up", daemon=True).start()
+
+    def start(self, agent: "ArymalabsAgent"):
+        """Warm up now and again after every knowledge-base reload"""
+        agent.knowledge.on_reload(lambda kb: self.schedule_warm_up(agent))
+        self.schedule_warm_up(agent)
+
+_shared_warm_answers: Optional[WarmAnswers] = None
+_started: Set[int] = set()
+_shared_lock = threading.Lock()
+
+def shared_warm_answers() -> WarmAnswers:
+    """Process-wide warm answer store used by every agent instance unless one is passed explicitly"""
+    global _shared_warm_answers
+    with _shared_lock:
+        if _shared_warm_answers is None:
+            _shared_warm_answers = WarmAnswers()
+        return _shared_warm_answers
+
+def start_warm_answers(agent: "ArymalabsAgent") -> WarmAnswers:
+    """Start warming the agent's knowledge base once per process (idempotent across Streamlit reruns)"""
+    warm = agent.warm
+    with _shared_lock:
+        if id(agent.knowledge) in _started:
+            return warm
+        _started.add(id(agent.knowledge))
+    warm.start(agent)
+    return warm
@@ -1,186 +1,502 @@
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from bs4 import BeautifulSoup, CData, NavigableString
+import hashlib
 import json
+import logging
+import multiprocessing
+import os
+import threading
 import time
-from typing import Dict, List
+import queue
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from itertools import islice
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urljoin, urlparse
 import re
+from crawl_frontier import CrawlFrontier, canonicalize_url, parse_sitemap, same_site
+from embeddings import build_vector_index_from_store
+from keyword_matcher import KeywordMatcher
+from knowledge_store import staged_store, store_scraped_content
+from page_cache import PageCache
+from rate_limit import TokenBucket
+from text_dedup import BoilerplateFilter
+
+logger = logging.getLogger(__name__)
+
+# Keywords for each category
+CATEGORY_KEYWORDS = {
+    "MMM_SERVICES": [
+        "mmm service", "media mix modeling service", "attribution service",
+        "marketing mix modeling", "mmm consulting", "attribution modeling"
+    ],
+    "MMM_PRODUCTS": [
+        "mmm product", "media mix modeling tool", "attribution tool",
+        "mmm platform", "marketing mix modeling software", "mmm solution"
+    ],
+    "EXPERIMENTATION_PRODUCTS": [
+        "experimentation", "a/b testing", "experiment", "test", "testing",
+        "experimental design", "statistical testing", "causal inference"
+    ]
+}
+
+CATEGORY_MATCHER = KeywordMatcher(CATEGORY_KEYWORDS)
+
+PARSE_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+HEADING_LEVELS = {f"h{level}": level for level in range(1, 7)}
+TEXT_TYPES = (NavigableString, CData)
+
+# Bump when the layout of cached page records changes
+PAGE_RECORD_VERSION = 2
+
+def resolve_parser(parser: str) -> str:
+    """Return the requested BeautifulSoup parser backend, falling back to html.parser if it is not installed"""
+    if parser == "lxml":
+        try:
+            import lxml  # noqa: F401
+        except ImportError:
+            logger.info("lxml is not installed, using html.parser")
+            return "html.parser"
+    return parser
 
 class ArymalabsScraper:
-    def __init__(self, base_url: str = "https://www.arymalabs.com"):
+    def __init__(self, base_url: str = "https://www.arymalabs.com", max_workers: int = 4,
+                 requests_per_second: float = 2.0, burst: int = 2, timeout: int = 30,
+                 cache: Optional[PageCache] = None, max_pages: int = 25, max_depth: int = 3,
+                 use_sitemap: bool = True, parser: str = "html.parser", parse_workers: Optional[int] = None,
+                 parse_queue_size: int = 16, parse_nice: int = 0):
         self.base_url = base_url
+        self.parser = resolve_parser(parser)
+        # Parsing is CPU-bound pure Python; 0 parses inline on the fetch threads
+        self.parse_workers = (os.cpu_count() or 1) if parse_workers is None else parse_workers
+        self.parse_queue_size = parse_queue_size
+        # Niceness added to parse worker processes, so a background crawl yields the CPU to serving threads
+        self.parse_nice = parse_nice
+        self._parse_pool: Optional[ProcessPoolExecutor] = None
+        self.cache = cache
+        self.max_pages = max_pages
+        self.max_depth = max_depth
+        self.use_sitemap = use_sitemap
+        self.max_workers = max_workers
+        self.requests_per_second = requests_per_second
+        self.burst = burst
+        self.timeout = timeout
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         })
+        # Size the connection pool to the worker count so threads reuse keep-alive connections
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._buckets_lock = threading.Lock()
+        self.stats = {"pages_fetched": 0, "bytes_fetched": 0, "not_modified": 0, "pages_parsed": 0, "parse_seconds": 0.0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, **increments):
+        """Add to the crawl statistics from any fetch or parse thread"""
+        with self._stats_lock:
+            for key, value in increments.items():
+                self.stats[key] += value
+
+    def _bucket_for(self, url: str) -> TokenBucket:
+        """Return the politeness bucket for the host of a URL"""
+        host = urlparse(url).netloc
+        with self._buckets_lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                bucket = TokenBucket(self.requests_per_second, self.burst)
+                self._buckets[host] = bucket
+            return bucket
         
     def scrape_page(self, url: str) -> BeautifulSoup:
         """Scrape a single page and return BeautifulSoup object"""
         try:
-            response = self.session.get(url, timeout=30)
+            self._bucket_for(url).acquire()
+            response = self.session.get(url, timeout=self.timeout)
             response.raise_for_status()
-            return BeautifulSoup(response.content, 'html.parser')
+            return BeautifulSoup(response.content, self.parser)
         except Exception as e:
-            print(f"Error scraping {url}: {e}")
+            logger.warning("fetch failed url=%s: %s", url, e)
             return None
-    
+
+    def fetch_raw(self, url: str) -> Optional[Dict]:
+        """Fetch stage: download a page, or return the cached record if it is unchanged
+
+        Returns None on error, a cached page record (with "changed" False), or a raw
+        page {"url", "content", "content_hash", "etag", "last_modified"} to be parsed.
+        """
+        cached = self.cache.get(url) if self.cache else None
+        if cached and cached.get("version") != PAGE_RECORD_VERSION:
+            # Entries written by an older record layout are re-fetched and re-parsed
+            cached = None
+        headers = self.cache.conditional_headers(url) if cached else {}
+        try:
+            self._bucket_for(url).acquire()
+            response = self.session.get(url, headers=headers, timeout=self.timeout)
+            if response.status_code == 304 and cached:
+                self._count(not_modified=1)
+                return dict(cached, changed=False)
+            response.raise_for_status()
+            self._count(pages_fetched=1, bytes_fetched=len(response.content))
+        except Exception as e:
+            logger.warning("fetch failed url=%s: %s", url, e)
+            return None
+
+        validators = {"etag": response.headers.get("ETag"), "last_modified": response.headers.get("Last-Modified")}
+        content_hash = hashlib.sha256(response.content).hexdigest()
+        if cached and cached.get("content_hash") == content_hash:
+            # Server ignored the validators but the body is identical, so skip parsing
+            record = dict(cached, **validators)
+            if self.cache:
+                self.cache.put(url, record)
+            return dict(record, changed=False)
+
+        return dict(validators, url=url, content=response.content, content_hash=content_hash)
+
+    def finish_record(self, raw: Dict, record: Dict) -> Dict:
+        """Attach validators to a freshly parsed record and store it in the cache"""
+        record.update(
+            content_hash=raw["content_hash"], etag=raw["etag"],
+            last_modified=raw["last_modified"], version=PAGE_RECORD_VERSION
+        )
+        if self.cache:
+            self.cache.put(raw["url"], record)
+        return dict(record, changed=True)
+
+    def parse_raw(self, raw: Dict) -> Dict:
+        """Parse stage run inline: build the page record from raw HTML"""
+        return self.build_page_record(raw["url"], BeautifulSoup(raw["content"], self.parser))
+
+    def timed_parse(self, raw: Dict) -> Tuple[Dict, float]:
+        """Parse a raw page and report how long it took"""
+        started = time.perf_counter()
+        record = self.parse_raw(raw)
+        return record, time.perf_counter() - started
+
+    def fetch_page(self, url: str) -> Optional[Dict]:
+        """Fetch a page and return its extracted record, reusing the cache when it is unchanged"""
+        raw = self.fetch_raw(url)
+        if raw is None or "content" not in raw:
+            return raw
+        record, elapsed = self.timed_parse(raw)
+        self._count(pages_parsed=1, parse_seconds=elapsed)
+        return self.finish_record(raw, record)
+
+    def _parse_executor(self) -> ProcessPoolExecutor:
+        if self._parse_pool is None:
+            # Never fork: the crawl runs next to fetch threads, and in the app inside a threaded
+            # server, so a forked child could inherit locks (logging, sqlite) held by other threads
+            self._parse_pool = ProcessPoolExecutor(
+                max_workers=self.parse_workers, mp_context=multiprocessing.get_context(PARSE_START_METHOD),
+                initializer=_init_parse_worker, initargs=(self.base_url, self.parser, self.parse_nice)
+            )
+        return self._parse_pool
+
+    def fetch_pages(self, urls: List[str]) -> List[Optional[Dict]]:
+        """Fetch several pages concurrently, returning records in the same order as urls
+
+        Fetch threads hand raw pages to the parse stage through a bounded queue, so a
+        slow parse stage applies backpressure instead of buffering the whole crawl.
+        With parse_workers > 0 pages are parsed in a process pool; otherwise inline.
+        """
+        if not urls:
+            return []
+        if not self.parse_workers:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                return list(executor.map(self.fetch_page, urls))
+
+        results: List[Optional[Dict]] = [None] * len(urls)
+        raw_pages = queue.Queue(maxsize=self.parse_queue_size)
+        parse_pool = self._parse_executor()
+        in_flight = {}
+        stopped = threading.Event()
+
+        def fetch(index: int, url: str):
+            try:
+                raw = self.fetch_raw(url)
+            except Exception as e:
+                logger.warning("fetch failed url=%s: %s", url, e)
+                raw = None
+            # A blocked put would never return once the consumer has stopped
+            while not stopped.is_set():
+                try:
+                    raw_pages.put((index, raw), timeout=0.1)
+                    return
+                except queue.Full:
+                    pass
+
+        def parse_inline(index: int, raw: Dict):
+            try:
+                record, elapsed = self.timed_parse(raw)
+                self._count(pages_parsed=1, parse_seconds=elapsed)
+                results[index] = self.finish_record(raw, record)
+            except Exception as e:
+                logger.warning("parse failed url=%s: %s", raw["url"], e)
+
+        def pool_broken():
+            # A worker died (e.g. OOM-killed); the rest of this crawl parses inline
+            nonlocal parse_pool
+            if parse_pool is not None:
+                logger.warning("parse worker process died; parsing the remaining pages inline")
+                self.discard_parse_pool()
+                parse_pool = None
+
+        def collect(done):
+            for future in done:
+                index, raw = in_flight.pop(future)
+                try:
+                    record, elapsed = future.result()
+                    self._count(pages_parsed=1, parse_seconds=elapsed)
+                    results[index] = self.finish_record(raw, record)
+                except BrokenProcessPool:
+                    pool_broken()
+                    parse_inline(index, raw)
+                except Exception as e:
+                    logger.warning("parse failed url=%s: %s", raw["url"], e)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as fetchers:
+            try:
+                for index, url in enumerate(urls):
+                    fetchers.submit(fetch, index, url)
+                for _ in range(len(urls)):
+                    index, raw = raw_pages.get()
+                    if raw is None or "content" not in raw:
+                        results[index] = raw
+                        continue
+                    # Keep at most parse_queue_size pages in the parse stage
+                    while len(in_flight) >= self.parse_queue_size:
+                        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                        collect(done)
+                    if parse_pool is None:
+                        parse_inline(index, raw)
+                        continue
+                    try:
+                        in_flight[parse_pool.submit(_parse_in_worker, raw["url"], raw["content"])] = (index, raw)
+                    except BrokenProcessPool:
+                        pool_broken()
+                        parse_inline(index, raw)
+                collect(list(in_flight))
+            finally:
+                # On any error, let the fetch threads exit instead of waiting on the queue
+                stopped.set()
+                fetchers.shutdown(cancel_futures=True)
+        return results
+
+    def close(self):
+        """Shut down the parse process pool, if one was started"""
+        if self._parse_pool is not None:
+            self._parse_pool.shutdown()
+            self._parse_pool = None
+
+    def discard_parse_pool(self):
+        """Drop a broken parse pool without waiting for it; the next crawl starts a new one"""
+        if self._parse_pool is not None:
+            self._parse_pool.shutdown(wait=False, cancel_futures=True)
+            self._parse_pool = None
+
+    def build_page_record(self, url: str, soup: BeautifulSoup) -> Dict:
+        """Extract everything the knowledge base needs from a parsed page"""
+        sections = self.extract_sections(soup)
+        text = ' '.join(block for section in sections for block in section["blocks"])
+        return {
+            "url": url,
+            "text": text,
+            "links": self.find_links(soup, url),
+            "sections": sections,
+            "categorized_content": self.categorize_content(text)
+        }
+
     def extract_text_content(self, soup: BeautifulSoup) -> str:
         """Extract clean text content from soup object"""
-        if not soup:
-            return ""
-        
-        # Remove script and style elements
-        for script in soup(["script", "style"]):
-            script.decompose()
-        
-        # Get text and clean it
-        text = soup.get_text()
+        return ' '.join(self.extract_text_blocks(soup))
+
+    def extract_text_blocks(self, soup: BeautifulSoup) -> List[str]:
+        """Extract clean text blocks (non-empty lines and phrases) from soup object"""
+        return [block for section in self.extract_sections(soup) for block in section["blocks"]]
+
+    def split_blocks(self, text: str) -> List[str]:
+        """Split raw text into clean blocks (non-empty lines and phrases)"""
         lines = (line.strip() for line in text.splitlines())
         chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-        text = ' '.join(chunk for chunk in chunks if chunk)
-        
-        return text
+        return [chunk for chunk in chunks if chunk]
     
-    def find_links(self, soup: BeautifulSoup) -> List[str]:
-        """Find all internal links on the page"""
+    def find_links(self, soup: BeautifulSoup, page_url: Optional[str] = None) -> List[str]:
+        """Find all internal links on the page, resolved and canonicalized"""
         if not soup:
             return []
         
-        links = []
+        page_url = page_url or self.base_url
+        links = {}
         for link in soup.find_all('a', href=True):
-            href = link['href']
-            if href.startswith('/'):
-                href = self.base_url + href
-            elif href.startswith(self.base_url):
-                links.append(href)
+            href = canonicalize_url(link['href'], page_url)
+            if href and same_site(href, self.base_url):
+                links[href] = None
         
-        return list(set(links))
+        return list(links)
+
+    def fetch_sitemap_urls(self) -> List[str]:
+        """Collect page URLs from the site's sitemap.xml, following one level of sitemap index"""
+        sitemap_urls = [urljoin(self.base_url, '/sitemap.xml')]
+        page_urls = []
+        for depth in range(2):
+            nested = []
+            for sitemap_url in sitemap_urls:
+                try:
+                    self._bucket_for(sitemap_url).acquire()
+                    response = self.session.get(sitemap_url, timeout=self.timeout)
+                    response.raise_for_status()
+                except Exception as e:
+                    logger.warning("could not read sitemap url=%s: %s", sitemap_url, e)
+                    continue
+                pages, children = parse_sitemap(response.content)
+                page_urls.extend(pages)
+                nested.extend(children)
+            sitemap_urls = nested
+        return page_urls
     
-    def categorize_content(self, text: str) -> Dict[str, str]:
+    def categorize_content(self, text: str) -> Dict[str, List[str]]:
         """Categorize content based on keywords"""
-        categories = {
-            "MMM_SERVICES": [],
-            "MMM_PRODUCTS": [],
-            "EXPERIMENTATION_PRODUCTS": []
-        }
+        categories = {category: {} for category in CATEGORY_KEYWORDS}
+        
+        # Split and lowercase each sentence once, then match every category's keywords in a single pass
+        for sentence in text.split('.'):
+            labels = CATEGORY_MATCHER.labels(sentence.lower())
+            if labels:
+                sentence = sentence.strip()
+                for category in labels:
+                    categories[category][sentence] = None
         
-        # Keywords for each category
-        mmm_service_keywords = [
-            "mmm service", "media mix modeling service", "attribution service",
-            "marketing mix modeling", "mmm consulting", "attribution modeling"
-        ]
-        
-        mmm_product_keywords = [
-            "mmm product", "media mix modeling tool", "attribution tool",
-            "mmm platform", "marketing mix modeling software", "mmm solution"
-        ]
-        
-        experiment_keywords = [
-            "experimentation", "a/b testing", "experiment", "test", "testing",
-            "experimental design", "statistical testing", "causal inference"
-        ]
-        
-        text_lower = text.lower()
-        
-        # Check for MMM Services
-        for keyword in mmm_service_keywords:
-            if keyword in text_lower:
-                # Extract relevant sentences
-                sentences = text.split('.')
-                for sentence in sentences:
-                    if keyword in sentence.lower():
-                        categories["MMM_SERVICES"].append(sentence.strip())
-        
-        # Check for MMM Products
-        for keyword in mmm_product_keywords:
-            if keyword in text_lower:
-                sentences = text.split('.')
-                for sentence in sentences:
-                    if keyword in sentence.lower():
-                        categories["MMM_PRODUCTS"].append(sentence.strip())
-        
-        # Check for Experimentation Products
-        for keyword in experiment_keywords:
-            if keyword in text_lower:
-                sentences = text.split('.')
-                for sentence in sentences:
-                    if keyword in sentence.lower():
-                        categories["EXPERIMENTATION_PRODUCTS"].append(sentence.strip())
-        
-        return categories
+        # Dicts keep first-seen order while dropping repeated sentences
+        return {category: list(sentences) for category, sentences in categories.items()}
     
     def scrape_website(self) -> Dict[str, any]:
         """Main method to scrape the entire website"""
-        print("Starting website scraping...")
+        logger.info("crawl started base_url=%s", self.base_url)
         
-        # Start with the main page
-        main_soup = self.scrape_page(self.base_url)
-        if not main_soup:
-            print("Could not access main website, using fallback content...")
+        # Start with the main page; it is the root of the breadth-first frontier
+        frontier = CrawlFrontier(self.base_url, max_depth=self.max_depth, max_pages=self.max_pages)
+        frontier.add(self.base_url, 0)
+        main_url, _ = frontier.next_batch()[0]
+        main_page = self.fetch_page(main_url)
+        if not main_page:
+            logger.warning("could not reach the homepage; using fallback content")
             return self.get_fallback_content()
         
-        # Extract main page content
-        main_content = self.extract_text_content(main_soup)
-        
-        # Find all internal links
-        links = self.find_links(main_soup)
-        print(f"Found {len(links)} internal links")
-        
-        # Scrape additional pages (limit to avoid overwhelming)
-        all_content = main_content
-        scraped_pages = 0
-        max_pages = 10  # Limit to prevent excessive requests
-        
-        for link in links[:max_pages]:
-            if scraped_pages >= max_pages:
-                break
-                
-            print(f"Scraping: {link}")
-            page_soup = self.scrape_page(link)
-            if page_soup:
-                page_content = self.extract_text_content(page_soup)
-                all_content += " " + page_content
-                scraped_pages += 1
-            
-            # Be respectful with requests
-            time.sleep(1)
-        
-        # Categorize the content
-        categorized_content = self.categorize_content(all_content)
-        
-        # Also try to extract specific sections
-        sections = self.extract_sections(main_soup)
+        # Expand the crawl breadth-first from the homepage, optionally seeded from the sitemap
+        frontier.add_all(main_page["links"], 1)
+        if self.use_sitemap:
+            sitemap_added = frontier.add_all(self.fetch_sitemap_urls(), 1)
+            logger.info("seeded %d URLs from the sitemap", sitemap_added)
+        logger.info("found %d internal links", len(frontier.seen) - 1)
+        
+        # Pages are fetched concurrently; politeness is enforced per host by the token bucket
+        pages = []
+        try:
+            while not frontier.exhausted:
+                batch = frontier.next_batch()
+                for link, depth in batch:
+                    logger.debug("fetching depth=%d url=%s", depth, link)
+                records = self.fetch_pages([link for link, _ in batch])
+                for (link, depth), page in zip(batch, records):
+                    if page:
+                        pages.append(page)
+                        frontier.add_all(page["links"], depth + 1)
+        finally:
+            self.close()
+        
+        # Merge the per-page categorization (cached for unchanged pages)
+        categorized_content = {}
+        for page in [main_page] + pages:
+            for category, sentences in page["categorized_content"].items():
+                categorized_content.setdefault(category, {}).update(dict.fromkeys(sentences))
+        categorized_content = {category: list(sentences) for category, sentences in categorized_content.items()}
+        
+        # Navigation and footers (on most pages) are dropped; other repeated blocks stay on the first page that has them
+        all_pages = [main_page] + pages
+        keep_masks, boilerplate = BoilerplateFilter().keep_mask(
+            [[block for section in page["sections"] for block in section["blocks"]] for page in all_pages]
+        )
+        
+        # Section records for every page, with boilerplate and repeated blocks removed
+        sections = []
+        unique_blocks = []
+        for page, mask in zip(all_pages, keep_masks):
+            keep = iter(mask)
+            page_blocks = []
+            for section in page["sections"]:
+                kept = [block for block in section["blocks"] if next(keep)]
+                if kept:
+                    sections.append({"url": page["url"], "heading_path": section["heading_path"], "text": ' '.join(kept)})
+                    page_blocks.extend(kept)
+            unique_blocks.append(page_blocks)
+        main_content = ' '.join(unique_blocks[0])
         
         result = {
             "main_content": main_content[:2000],  # First 2000 chars
+            "boilerplate": ' '.join(boilerplate),
+            "pages": [
+                {"url": page["url"], "text": ' '.join(blocks)}
+                for page, blocks in zip(all_pages, unique_blocks)
+            ],
             "categorized_content": categorized_content,
             "sections": sections,
-            "total_pages_scraped": scraped_pages + 1,
-            "links_found": len(links)
+            "total_pages_scraped": len(pages) + 1,
+            "links_found": len(frontier.seen) - 1,
+            "pages_changed": sum(1 for page in [main_page] + pages if page["changed"])
         }
         
         return result
     
-    def extract_sections(self, soup: BeautifulSoup) -> Dict[str, str]:
-        """Extract specific sections from the main page"""
-        sections = {}
+    def extract_sections(self, soup: BeautifulSoup) -> List[Dict]:
+        """Segment a page into sections in a single document-order walk
+
+        Every text block is assigned to its nearest preceding heading. Each section is
+        {"heading_path": [h1, h2, ...], "blocks": [...]}, starting with the heading's own
+        text; text before the first heading gets an empty heading path.
+        """
+        sections = []
         
         if not soup:
             return sections
         
-        # Look for common section headers
-        headers = soup.find_all(['h1', 'h2', 'h3', 'h4', 'h5', 'h6'])
-        
-        for header in headers:
-            header_text = header.get_text().strip()
-            if any(keyword in header_text.lower() for keyword in ['service', 'product', 'solution', 'about']):
-                # Get the content following this header
-                content = ""
-                next_element = header.find_next_sibling()
-                while next_element and next_element.name not in ['h1', 'h2', 'h3', 'h4', 'h5', 'h6']:
-                    content += next_element.get_text() + " "
-                    next_element = next_element.find_next_sibling()
-                
-                sections[header_text] = content.strip()
+        # Remove script and style elements
+        for script in soup(["script", "style"]):
+            script.decompose()
+        
+        heading_stack = []  # (level, text) for the current heading path
+        heading_path = []
+        buffer = []
+        
+        def flush():
+            blocks = self.split_blocks(''.join(buffer))
+            if blocks:
+                sections.append({"heading_path": heading_path, "blocks": blocks})
+            buffer.clear()
+        
+        elements = iter(soup.descendants)
+        for element in elements:
+            if isinstance(element, NavigableString):
+                # Like get_text(): only text and CDATA, not comments, doctypes or processing instructions
+                if type(element) in TEXT_TYPES:
+                    buffer.append(str(element))
+            elif element.name in HEADING_LEVELS:
+                flush()
+                heading_text = ' '.join(self.split_blocks(element.get_text()))
+                # Skip the heading's own descendants; subtrees are disjoint so the walk stays linear
+                for _ in islice(elements, sum(1 for _ in element.descendants)):
+                    pass
+                level = HEADING_LEVELS[element.name]
+                while heading_stack and heading_stack[-1][0] >= level:
+                    heading_stack.pop()
+                if heading_text:
+                    heading_stack.append((level, heading_text))
+                    buffer.append(heading_text + "\n")
+                heading_path = [text for _, text in heading_stack]
+        flush()
         
         return sections
     
@@ -211,21 +527,67 @@ class ArymalabsScraper:
                     "Causal inference and incrementality testing"
                 ]
             },
-            "sections": {},
+            "sections": [],
             "total_pages_scraped": 0,
             "links_found": 0
         }
 
-def main():
-    scraper = ArymalabsScraper()
+# Per-process scraper used by the parse stage; created once by the pool initializer
+_worker_scraper = None
+
+def _init_parse_worker(base_url: str, parser: str, nice: int = 0):
+    global _worker_scraper
+    if nice and hasattr(os, "nice"):
+        os.nice(nice)
+    _worker_scraper = ArymalabsScraper(base_url, parser=parser, parse_workers=0)
+
+def _parse_in_worker(url: str, content: bytes) -> Tuple[Dict, float]:
+    return _worker_scraper.timed_parse({"url": url, "content": content})
+
+def refresh_knowledge_base(scraper: Optional[ArymalabsScraper] = None, output_path: str = 'scraped_content.json',
+                           knowledge_store_path: str = 'knowledge.db', vector_index_path: str = 'knowledge_vectors',
+                           require_pages: bool = False) -> Dict:
+    """Crawl the site and write a new knowledge base version: chunk store, vectors and scraped_content.json
+
+    With require_pages, a crawl that could not reach the site raises instead of
+    replacing the current content with the built-in fallback.
+    """
+    scraper = scraper or ArymalabsScraper()
+    if scraper.cache is None:
+        scraper.cache = PageCache()
     result = scraper.scrape_website()
+    scraper.cache.save()
+    if require_pages and not result.get("total_pages_scraped"):
+        raise RuntimeError("Could not reach the website; keeping the current content")
+    
+    # Index full page text into a copy of the chunk store (only changed pages are rewritten)
+    # and swap it in whole, so a running agent never reads a half-updated store
+    with staged_store(knowledge_store_path) as store:
+        pages_indexed = store_scraped_content(result, store, CATEGORY_MATCHER)
+        if pages_indexed or not os.path.exists(f'{vector_index_path}.npy'):
+            vectors = build_vector_index_from_store(store, vector_index_path)
+            logger.info("vector index rebuilt chunks=%d", vectors)
+    logger.info("knowledge store updated pages_changed=%d", pages_indexed)
     
-    # Save results to file
-    with open('scraped_content.json', 'w') as f:
+    if result.get("pages_changed") == 0 and not pages_indexed and os.path.exists(output_path):
+        logger.info("no pages changed since the last crawl; keeping %s", output_path)
+        # Its modification time marks the last successful crawl, which the refresh schedule continues from
+        os.utime(output_path)
+        return result
+    
+    # Written to a temporary file and renamed, so a running agent never reloads a half-written file
+    tmp_path = f"{output_path}.tmp"
+    with open(tmp_path, 'w') as f:
         json.dump(result, f, indent=2)
+    os.replace(tmp_path, output_path)
     
-    print("Scraping completed. Results saved to scraped_content.json")
+    logger.info("crawl saved to %s", output_path)
     return result
 
+def main():
+    from metrics import configure_logging
+    configure_logging("INFO")
+    return refresh_knowledge_base()
+
 if __name__ == "__main__":
     main()